@@ -4,6 +4,15 @@ const nextConfig = {
   images: {
     domains: [],
   },
+  async headers() {
+    return [
+      {
+        // {id}.{hash8}.webp names change whenever the content does
+        source: '/photos/:file([\\w-]+\\.[0-9a-f]{8}\\.(?:webp|avif))',
+        headers: [{ key: 'Cache-Control', value: 'public, max-age=31536000, immutable' }],
+      },
+    ];
+  },
 };
 
 module.exports = nextConfig;
\ No newline at end of file
@@ -0,0 +1,226 @@
+"""Benchmarks for the conversion, editor preview and JSON sorter paths
+
+    python benchmark.py --workdir ./bench --save-baseline bench_baseline.json
+    python benchmark.py --workdir ./bench --baseline bench_baseline.json
+
+Synthetic corpora are generated once per workdir from a fixed seed, so
+runs on the same machine are comparable. Every case runs in a fresh
+process to keep its peak RSS separate from the others.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from profiling import latency_summary
+
+# Megapixel sizes of the image corpus, cycled over the files
+IMAGE_SIZES = ((4272, 2848), (5472, 3648), (6000, 4000))
+SEASONS = ('SS25', 'FW25', 'SS26')
+TAGS = ('Nature', 'Urban', 'Wildlife', 'Portrait', 'Conceptual', 'Monochrome', 'Macro', 'Night', 'Candid')
+ITEMS_PER_JSON_FILE = 1000
+# Metrics where higher is better; latencies and peak RSS are lower-is-better
+THROUGHPUT_KEYS = ('files_per_s', 'items_per_s')
+LATENCY_KEYS = ('p50_ms', 'p95_ms')
+
+
+def peak_rss_mb():
+    """Peak RSS of this process and its finished children, in MB"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes elsewhere
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(max(own, children) / scale, 1)
+
+
+def make_image_corpus(directory, count, seed=1):
+    """JPEGs of 12-24MP with every EXIF orientation"""
+    from PIL import Image
+
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    for i in range(count):
+        path = os.path.join(directory, f"bench_{i:04d}.jpg")
+        if os.path.exists(path):
+            continue
+        width, height = IMAGE_SIZES[i % len(IMAGE_SIZES)]
+        # Gradient plus noise compresses like a real photo, not like a flat fill
+        gradient = Image.linear_gradient("L").resize((width, height))
+        noise = Image.effect_noise((width, height), rng.randint(20, 60))
+        tint = Image.new("L", (width, height), rng.randint(0, 255))
+        img = Image.merge("RGB", (gradient, noise, tint))
+        exif = img.getexif()
+        exif[0x0112] = i % 8 + 1
+        img.save(path, format="JPEG", quality=92, exif=exif)
+
+
+def make_json_corpus(directory, items, seed=1):
+    """Files of photos.json-shaped records totalling the given item count"""
+    os.makedirs(directory, exist_ok=True)
+    parts = [f for f in os.listdir(directory) if f.startswith("part_")]
+    if len(parts) == -(-items // ITEMS_PER_JSON_FILE):
+        return
+    rng = random.Random(seed)
+    for start in range(0, items, ITEMS_PER_JSON_FILE):
+        records = []
+        for i in range(start, min(items, start + ITEMS_PER_JSON_FILE)):
+            tdate = f"20{rng.randint(20, 26)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            records.append({
+                "id": f"{tdate.replace('-', '')}_{i}",
+                "title": f"Photo {i}",
+                "description": "",
+                "season": rng.choice(SEASONS),
+                "tags": rng.sample(TAGS, rng.randint(1, 3)),
+                "camera": "Canon EOS 1100D",
+                "lens": "Tamron 18-270mm F/3.5-6.3 Di II VC PZD",
+                "dimension": "4272x2848",
+                "udate": tdate,
+                "tdate": tdate,
+                "featured": rng.random() < 0.3,
+            })
+        with open(os.path.join(directory, f"part_{start // ITEMS_PER_JSON_FILE:05d}.json"), "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+
+
+def corpus_paths(image_dir, count):
+    """The first count corpus images, a workdir kept from a larger run has more"""
+    from converter import list_images
+
+    return [os.path.join(image_dir, f) for f in list_images(image_dir)[:count]]
+
+
+def bench_convert(image_dir, output_dir, workers, count):
+    from converter import ConversionEngine, ConvertConfig, convert_to_webp
+
+    paths = corpus_paths(image_dir, count)
+    config = ConvertConfig(output_dir=output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Sequential pass for per-file latency
+    latencies = []
+    for path in paths:
+        started = time.perf_counter()
+        convert_to_webp(path, config)
+        latencies.append(time.perf_counter() - started)
+
+    # Parallel pass for throughput
+    engine = ConversionEngine(config, workers=workers)
+    started = time.perf_counter()
+    engine.run(paths)
+    elapsed = time.perf_counter() - started
+    return {"files": len(paths), "files_per_s": round(len(paths) / elapsed, 3), **latency_summary(latencies)}
+
+
+def bench_editor(image_dir, count):
+    from previews import load_preview
+
+    paths = corpus_paths(image_dir, count)
+    latencies = []
+    for path in paths:
+        started = time.perf_counter()
+        load_preview(path, (400, 400))
+        latencies.append(time.perf_counter() - started)
+    total = sum(latencies)
+    return {"files": len(paths), "files_per_s": round(len(paths) / total, 3), **latency_summary(latencies)}
+
+
+def bench_sorter(json_dir, workers):
+    from json_sorter import sort_directory
+
+    started = time.perf_counter()
+    result = sort_directory(json_dir, newest_first=True, save=True, workers=workers)
+    elapsed = time.perf_counter() - started
+    return {"items": result["total"], "items_per_s": round(result["total"] / elapsed, 1), "seconds": round(elapsed, 3)}
+
+
+def _isolated(func, *args):
+    result = func(*args) or {}
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_isolated(func, *args):
+    """Run one benchmark case in a fresh process"""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(_isolated, func, *args).result()
+
+
+def compare(results, baseline, tolerance, latency_tolerance=0.20, rss_tolerance=0.15):
+    """Regressions beyond tolerance, as readable lines
+
+    Throughput may drop by tolerance, p50/p95 latency rise by
+    latency_tolerance and peak RSS rise by rss_tolerance.
+    """
+    regressions = []
+    for case, metrics in results.items():
+        base = baseline.get(case)
+        if not base:
+            continue
+        limits = [(key, -tolerance) for key in THROUGHPUT_KEYS]
+        limits += [(key, latency_tolerance) for key in LATENCY_KEYS]
+        limits.append(("peak_rss_mb", rss_tolerance))
+        for key, limit in limits:
+            if key in metrics and base.get(key):
+                change = metrics[key] / base[key] - 1
+                if change < limit if limit < 0 else change > limit:
+                    regressions.append(f"{case}.{key}: {base[key]} -> {metrics[key]} ({change:+.1%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the image tools hot paths")
+    parser.add_argument("--workdir", default="./bench", help="Where corpora and outputs are kept")
+    parser.add_argument("--images", type=int, default=24, help="Number of synthetic JPEGs")
+    parser.add_argument("--json-items", default="1000,100000", help="Comma separated sorter corpus sizes, e.g. 1000,100000,1000000")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cases", default="convert,editor,sorter")
+    parser.add_argument("--baseline", help="Compare against this results file")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed throughput drop before failing")
+    parser.add_argument("--latency-tolerance", type=float, default=0.20, help="Allowed p50/p95 latency rise")
+    parser.add_argument("--rss-tolerance", type=float, default=0.15, help="Allowed peak RSS rise")
+    parser.add_argument("--save-baseline", help="Write results to this file")
+    args = parser.parse_args(argv)
+
+    cases = set(args.cases.split(","))
+    image_dir = os.path.join(args.workdir, "images")
+    results = {}
+
+    # Corpora are generated in a child too, ru_maxrss survives fork and exec
+    # so a bloated parent would inflate every later measurement
+    if cases & {"convert", "editor"}:
+        run_isolated(make_image_corpus, image_dir, args.images)
+    if "convert" in cases:
+        results["convert"] = run_isolated(
+            bench_convert, image_dir, os.path.join(args.workdir, "out"), args.workers, args.images
+        )
+    if "editor" in cases:
+        results["editor"] = run_isolated(bench_editor, image_dir, args.images)
+    if "sorter" in cases:
+        for items in (int(n) for n in args.json_items.split(",") if n):
+            json_dir = os.path.join(args.workdir, f"json_{items}")
+            run_isolated(make_json_corpus, json_dir, items)
+            results[f"sorter_{items}"] = run_isolated(bench_sorter, json_dir, args.workers)
+
+    print(json.dumps(results, indent=2))
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(
+                results, json.load(f), args.tolerance, args.latency_tolerance, args.rss_tolerance
+            )
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+
+import os
+import json
+import sqlite3
+from fileio import write_json_atomic
+from manifest import ConversionManifest
+from site_index import build_site_index
+
+# Outside public/, which Next.js serves and deploys as static files
+CATALOGUE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "data", "catalogue.sqlite3")
+# Where earlier versions kept it, next to photos.json
+LEGACY_CATALOGUE_PATH = "./data/catalogue.sqlite3"
+PHOTOS_PATH = "./data/photos.json"
+PORTFOLIO_PATH = "./data/portfolio.json"
+ORDER_COLUMNS = ('udate', 'tdate')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS photos (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    season TEXT,
+    udate TEXT,
+    tdate TEXT,
+    featured INTEGER NOT NULL DEFAULT 0,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS photos_position ON photos(position);
+CREATE INDEX IF NOT EXISTS photos_udate ON photos(udate);
+CREATE INDEX IF NOT EXISTS photos_tdate ON photos(tdate);
+CREATE INDEX IF NOT EXISTS photos_season ON photos(season, position);
+CREATE INDEX IF NOT EXISTS photos_featured ON photos(featured, udate);
+CREATE TABLE IF NOT EXISTS photo_tags (
+    tag TEXT NOT NULL,
+    id TEXT NOT NULL REFERENCES photos(id) ON DELETE CASCADE,
+    PRIMARY KEY (tag, id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS photo_tags_id ON photo_tags(id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _encode(record):
+    # Key order is kept, so exports reproduce the records as written
+    return json.dumps(record, ensure_ascii=False)
+
+
+class Catalogue:
+    """Photo records in SQLite, ordered newest first like portfolio.json
+
+    Each record is stored whole as JSON, so keys the catalogue does not
+    index (placeholders, colours) round-trip unchanged. The indexed columns
+    serve lookups and listings; exports are skipped unless a write actually
+    changed something since the last export to that file.
+    """
+
+    def __init__(self, path=CATALOGUE_PATH):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM photos").fetchone()[0]
+
+    @property
+    def revision(self):
+        """Counter bumped by every write that changed a record"""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _bump(self):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('revision', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (str(self.revision + 1),)
+        )
+
+    def _put(self, record, text, position):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO photos (id, position, season, udate, tdate, featured, record) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                record["id"], position, record.get("season"), record.get("udate"), record.get("tdate"),
+                int(bool(record.get("featured"))), text
+            )
+        )
+        self.conn.execute("DELETE FROM photo_tags WHERE id = ?", (record["id"],))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO photo_tags (tag, id) VALUES (?, ?)",
+            [(tag, record["id"]) for tag in record.get("tags", [])]
+        )
+
+    def get(self, photo_id):
+        """Record for a photo id, or None"""
+        row = self.conn.execute("SELECT record FROM photos WHERE id = ?", (photo_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def upsert(self, items):
+        """Write records, new or changed ones go to the front in the given order
+
+        Unchanged records keep their place, so saving a folder again does
+        not reorder or re-export anything. Returns the number changed.
+        """
+        with self.conn:
+            changed = []
+            for item in items:
+                text = _encode(item)
+                row = self.conn.execute("SELECT record FROM photos WHERE id = ?", (item["id"],)).fetchone()
+                if row is None or row[0] != text:
+                    changed.append((item, text))
+            if not changed:
+                return 0
+            front = self.conn.execute("SELECT COALESCE(MIN(position), 0) FROM photos").fetchone()[0]
+            for offset, (item, text) in enumerate(changed):
+                self._put(item, text, front - len(changed) + offset)
+            self._bump()
+        return len(changed)
+
+    def replace_all(self, records):
+        """Make the catalogue hold exactly these records, in this order"""
+        with self.conn:
+            self.conn.execute("DELETE FROM photos")
+            for position, record in enumerate(r for r in records if isinstance(r, dict) and "id" in r):
+                self._put(record, _encode(record), position)
+            self._bump()
+
+    def reorder(self, ids):
+        """Put records in the order of ids, returns False when it already was"""
+        current = [photo_id for photo_id, in self.conn.execute("SELECT id FROM photos ORDER BY position")]
+        if current == list(ids):
+            return False
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE photos SET position = ? WHERE id = ?",
+                [(position, photo_id) for position, photo_id in enumerate(ids)]
+            )
+            self._bump()
+        return True
+
+    def apply_assets(self, assets):
+        """Merge converter fields (placeholder, assets) into existing records in place
+
+        Not an edit, so records keep their position. Returns the number changed.
+        """
+        changed = 0
+        with self.conn:
+            for photo_id, position, text in self.conn.execute("SELECT id, position, record FROM photos").fetchall():
+                fields = assets.get(photo_id)
+                if not fields:
+                    continue
+                record = {**json.loads(text), **fields}
+                updated = _encode(record)
+                if updated != text:
+                    self._put(record, updated, position)
+                    changed += 1
+            if changed:
+                self._bump()
+        return changed
+
+    def asset_files(self):
+        """Output file names the records link through their assets"""
+        names = set()
+        for text, in self.conn.execute("SELECT record FROM photos"):
+            for asset in (json.loads(text).get("assets") or {}).values():
+                names.add(asset["file"])
+        return names
+
+    def records(self):
+        """All records in catalogue order"""
+        return [json.loads(text) for text, in self.conn.execute("SELECT record FROM photos ORDER BY position")]
+
+    def listing(self, order="udate", newest_first=True, season=None, tag=None, featured=None, limit=None, offset=0):
+        """Records filtered on indexed columns and ordered by a date
+
+        Ties keep catalogue order, like the stable sorts on the site.
+        """
+        if order not in ORDER_COLUMNS:
+            raise ValueError(f"Cannot order by: {order}")
+        where, params = [], []
+        if season is not None:
+            where.append("season = ?")
+            params.append(season)
+        if featured is not None:
+            where.append("featured = ?")
+            params.append(int(bool(featured)))
+        if tag is not None:
+            where.append("id IN (SELECT id FROM photo_tags WHERE tag = ?)")
+            params.append(tag)
+        sql = "SELECT record FROM photos"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} {'DESC' if newest_first else 'ASC'}, position"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        return [json.loads(text) for text, in self.conn.execute(sql, params)]
+
+    def export(self, path, indent=2, force=False):
+        """Write the catalogue as a JSON array, only if it changed since the last export
+
+        Returns True when the file was written.
+        """
+        key = f"export:{os.path.abspath(path)}"
+        revision = str(self.revision)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        if not force and row and row[0] == revision and os.path.exists(path):
+            return False
+        write_json_atomic(path, self.records(), indent=indent)
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, revision)
+            )
+        return True
+
+
+def publish(catalogue, portfolio_path=PORTFOLIO_PATH, photos_path=PHOTOS_PATH, assets_dir=None, force=False):
+    """Export the catalogue and site index with the converter's current asset names
+
+    Records take the names from the assets_dir manifest first, the exports
+    follow, and only then are replaced outputs deleted, skipping any a
+    record still links, so photos.json never points at a missing file.
+    """
+    manifest = ConversionManifest(assets_dir) if assets_dir else None
+    assets_changed = catalogue.apply_assets(manifest.photo_assets()) if manifest else 0
+    portfolio_written = catalogue.export(portfolio_path, indent=4, force=force)
+    photos_written = catalogue.export(photos_path, indent=2, force=force)
+    index_changed = 0
+    if photos_written:
+        index_changed = build_site_index(catalogue.records(), os.path.dirname(os.path.abspath(photos_path)))
+    removed = manifest.remove_superseded(catalogue.asset_files()) if manifest else 0
+    return {
+        "assets_changed": assets_changed,
+        "portfolio_written": portfolio_written,
+        "photos_written": photos_written,
+        "index_changed": index_changed,
+        "removed": removed,
+    }
+
+
+def _move_database(source, target):
+    os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+    # WAL files hold committed writes not yet checkpointed, they move too
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(source + suffix):
+            os.replace(source + suffix, target + suffix)
+
+
+def open_catalogue(path=CATALOGUE_PATH, seed_paths=(PORTFOLIO_PATH, PHOTOS_PATH)):
+    """Open the catalogue, filling a new one from the existing JSON files
+
+    portfolio.json is the editor's own store and may hold records not yet
+    published to photos.json, so the seed is the union by id: the first
+    file's records in its order, then records only later files have.
+    """
+    if path == CATALOGUE_PATH and not os.path.exists(path) and os.path.exists(LEGACY_CATALOGUE_PATH):
+        _move_database(LEGACY_CATALOGUE_PATH, path)
+    catalogue = Catalogue(path)
+    if not len(catalogue):
+        records = []
+        seen = set()
+        for seed in seed_paths:
+            if not os.path.exists(seed):
+                continue
+            with open(seed, "r", encoding="utf-8") as f:
+                try:
+                    loaded = json.load(f)
+                except json.JSONDecodeError:
+                    continue
+            if not isinstance(loaded, list):
+                continue
+            for record in loaded:
+                if isinstance(record, dict) and "id" in record and record["id"] not in seen:
+                    seen.add(record["id"])
+                    records.append(record)
+        if records:
+            catalogue.replace_all(records)
+    return catalogue
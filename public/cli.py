@@ -0,0 +1,416 @@
+"""Command line entry point for the image tools
+
+    python cli.py convert --input ./images/todo --output ./images/processed
+    python cli.py watch --input ./images/todo --output ./images/processed
+    python cli.py worker --input /mnt/shared/todo --output /mnt/shared/processed
+    python cli.py sort ./exports --save
+    python cli.py merge ./images/todo/output.json
+    python cli.py catalogue list --order tdate --tag Macro --limit 10
+    python cli.py index ./data/photos.json
+    python cli.py duplicates ./photos
+    python cli.py gui
+
+Progress is printed to stdout as one JSON object per line. Pillow and
+tkinter are only imported by the subcommands that need them, so headless
+runs start quickly and work without a display.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+
+def emit(event, **fields):
+    """Print one machine-readable progress line"""
+    print(json.dumps({"event": event, **fields}, ensure_ascii=False), flush=True)
+
+
+def build_engine(args):
+    from converter import ConversionEngine, ConvertConfig, parse_widths
+
+    config = ConvertConfig(
+        output_dir=args.output,
+        quality=args.quality,
+        widths=parse_widths(args.widths),
+        max_width=args.max_width,
+        formats=tuple(f.strip() for f in args.formats.split(",") if f.strip()),
+        keep_smaller=args.keep_smaller,
+        target_kb=args.target_kb,
+        target_ssim=args.target_ssim,
+        hashed_names=args.hashed_names,
+    )
+    return ConversionEngine(
+        config,
+        backend=args.backend,
+        workers=args.workers,
+        incremental=args.incremental,
+        pixel_budget=int(args.pixel_budget * 1_000_000) or None,
+        profile_dir=getattr(args, "profile", None)
+    )
+
+
+def file_fields(result):
+    fields = {k: result[k] for k in ("file", "ok", "route", "quality", "skipped", "reason", "error") if k in result}
+    if "variants" in result:
+        fields["outputs"] = [v["file"] for v in result["variants"]]
+    return fields
+
+
+def run_convert(args):
+    from converter import list_images
+
+    if not os.path.isdir(args.input):
+        emit("error", message=f"Input folder does not exist: {args.input}")
+        return 2
+
+    try:
+        engine = build_engine(args)
+    except ValueError as e:
+        emit("error", message=str(e))
+        return 2
+
+    image_files = list_images(args.input)
+    emit("start", total=len(image_files), workers=engine.workers, backend=engine.backend)
+    done = 0
+
+    def on_result(result):
+        nonlocal done
+        done += 1
+        emit("file", done=done, total=len(image_files), **file_fields(result))
+
+    started = time.time()
+    results = engine.run([os.path.join(args.input, f) for f in image_files], on_result=on_result)
+    elapsed = time.time() - started
+    failed = sum(1 for r in results if not r["ok"])
+    if args.report or args.trace or args.profile:
+        from profiling import merge_profiles, pipeline_report, write_chrome_trace
+
+        if args.report:
+            emit("report", **pipeline_report(results, engine.workers, started, elapsed))
+        if args.trace:
+            emit("trace", path=args.trace, events=write_chrome_trace(results, args.trace))
+        if args.profile:
+            profile_path = os.path.join(args.profile, "convert.prof")
+            emit("profile", path=profile_path, files=merge_profiles(args.profile, profile_path))
+    emit(
+        "done",
+        total=len(results),
+        converted=sum(1 for r in results if r["ok"] and not r.get("skipped")),
+        skipped=sum(1 for r in results if r.get("skipped")),
+        failed=failed
+    )
+    return 1 if failed else 0
+
+
+def run_watch(args):
+    import asyncio
+    from watcher import FolderWatcher
+
+    if not os.path.isdir(args.input):
+        emit("error", message=f"Input folder does not exist: {args.input}")
+        return 2
+
+    try:
+        engine = build_engine(args)
+    except ValueError as e:
+        emit("error", message=str(e))
+        return 2
+
+    watcher = FolderWatcher(
+        args.input,
+        engine,
+        interval=args.interval,
+        settle=args.settle,
+        on_result=lambda result: emit("file", **file_fields(result)),
+        on_batch=lambda paths: emit("batch", files=len(paths))
+    )
+    emit("watch", input=args.input, output=args.output, pending=len(watcher.queue.paths), workers=engine.workers)
+    try:
+        asyncio.run(watcher.run())
+    except KeyboardInterrupt:
+        emit("stopped", pending=len(watcher.queue.paths))
+    return 0
+
+
+def emit_result(result):
+    emit("file", **file_fields(result))
+
+
+def run_worker(args):
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    from workqueue import run_worker as work
+
+    if not os.path.isdir(args.input):
+        emit("error", message=f"Input folder does not exist: {args.input}")
+        return 2
+    try:
+        engine = build_engine(args)
+    except ValueError as e:
+        emit("error", message=str(e))
+        return 2
+
+    # Each process claims files on its own, exactly like a worker on another host
+    emit("start", workers=engine.workers, lease_seconds=args.lease)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=engine.workers, mp_context=context) as executor:
+        futures = [
+            executor.submit(work, args.input, engine.config, args.lease, args.poll, args.follow, emit_result)
+            for _ in range(engine.workers)
+        ]
+        totals = [future.result() for future in futures]
+    emit(
+        "done",
+        converted=sum(t["converted"] for t in totals),
+        failed=sum(t["failed"] for t in totals),
+        workers=[t["owner"] for t in totals]
+    )
+    return 1 if any(t["failed"] for t in totals) else 0
+
+
+def run_sort(args):
+    from json_sorter import sort_directory
+
+    if not os.path.isdir(args.directory):
+        emit("error", message=f"Directory does not exist: {args.directory}")
+        return 2
+
+    def on_file(summary):
+        emit("file", **{k: summary[k] for k in ("file", "count", "error") if k in summary})
+
+    result = sort_directory(
+        args.directory,
+        newest_first=args.order == "newest",
+        save=args.save,
+        workers=args.workers,
+        on_file=on_file
+    )
+    emit("done", items=result["total"], files=len(result["files"]), errors=len(result["errors"]))
+    return 1 if result["errors"] else 0
+
+
+def run_merge(args):
+    from catalogue import open_catalogue, publish
+    from metadata_store import load_records, merge_records
+
+    items = []
+    for source in args.sources:
+        items = merge_records(items, load_records(source))
+    catalogue = open_catalogue(args.catalogue)
+    changed = catalogue.upsert(items)
+    published = publish(catalogue, args.portfolio, args.photos, args.assets)
+    emit(
+        "done",
+        merged=len(items),
+        changed=changed,
+        total=len(catalogue),
+        index_changed=published["index_changed"],
+        assets_changed=published["assets_changed"],
+        removed=published["removed"]
+    )
+    return 0
+
+
+def run_catalogue(args):
+    from catalogue import open_catalogue, publish
+    from metadata_store import load_records
+
+    catalogue = open_catalogue(args.catalogue)
+    if args.action == "import":
+        if not args.source or not os.path.exists(args.source):
+            emit("error", message=f"Source file does not exist: {args.source}")
+            return 2
+        catalogue.replace_all(load_records(args.source))
+    elif args.action == "sort":
+        ids = [r["id"] for r in catalogue.listing(order=args.order, newest_first=not args.oldest)]
+        emit("sorted", changed=catalogue.reorder(ids))
+    elif args.action == "list":
+        for record in catalogue.listing(
+            order=args.order,
+            newest_first=not args.oldest,
+            season=args.season,
+            tag=args.tag,
+            featured=args.featured,
+            limit=args.limit
+        ):
+            emit("photo", **record)
+        return 0
+
+    published = publish(catalogue, args.portfolio, args.photos, args.assets, force=args.force)
+    emit("done", total=len(catalogue), revision=catalogue.revision, **published)
+    return 0
+
+
+def run_index(args):
+    from metadata_store import load_records
+    from site_index import build_site_index
+
+    photos = load_records(args.catalogue)
+    changed = build_site_index(photos, os.path.dirname(os.path.abspath(args.catalogue)), page_size=args.page_size)
+    emit("done", photos=len(photos), changed=changed)
+    return 0
+
+
+def run_duplicates(args):
+    from duplicates import find_duplicates
+
+    if not os.path.isdir(args.folder):
+        emit("error", message=f"Folder does not exist: {args.folder}")
+        return 2
+
+    groups = find_duplicates(args.folder, threshold=args.threshold, method=args.method, workers=args.workers)
+    for group in groups:
+        emit("group", files=[{"file": name, "distance": distance} for name, distance in group])
+    emit("done", groups=len(groups))
+    return 0
+
+
+def run_gui(args):
+    import tkinter as tk
+    from tools import ImageToolsApp
+
+    root = tk.Tk()
+    ImageToolsApp(root)
+    root.mainloop()
+    return 0
+
+
+def add_convert_arguments(parser):
+    parser.add_argument("--input", default="./images/todo", help="Folder with source images")
+    parser.add_argument("--output", default="./images/processed", help="Folder for converted files")
+    parser.add_argument("--quality", type=int, default=85, help="Encoder quality 1-100")
+    parser.add_argument("--workers", type=int, default=None, help="Worker count, defaults to the core count")
+    parser.add_argument("--backend", choices=("process", "thread"), default="process")
+    parser.add_argument("--widths", default="", help="Comma separated derivative widths, e.g. 320,640,1280")
+    parser.add_argument("--max-width", type=int, default=0, help="Cap the main output width, 0 keeps the original")
+    parser.add_argument("--formats", default="webp", help="Comma separated output formats: webp,avif")
+    parser.add_argument(
+        "--pixel-budget",
+        type=float,
+        default=0,
+        help="Megapixels decoded at once across workers, 0 uses a fixed worker count"
+    )
+    parser.add_argument(
+        "--keep-smaller",
+        action="store_true",
+        help="Encode WEBP both lossy and lossless and keep the smaller file"
+    )
+    parser.add_argument(
+        "--target-kb",
+        type=int,
+        default=0,
+        help="Pick quality per image so the main output is about this size, usually within 10%%, "
+             "up to about 25%% off where WEBP size jumps between qualities"
+    )
+    parser.add_argument(
+        "--target-ssim",
+        type=float,
+        default=0.0,
+        help="Pick the lowest quality per image reaching this SSIM, e.g. 0.97"
+    )
+    parser.add_argument(
+        "--hashed-names",
+        action="store_true",
+        help="Name outputs {id}.{hash8}.webp so they can be cached as immutable"
+    )
+
+
+def add_catalogue_arguments(parser):
+    from catalogue import CATALOGUE_PATH
+
+    parser.add_argument("--catalogue", default=CATALOGUE_PATH, help="SQLite file, kept outside public/")
+    parser.add_argument("--portfolio", default="./data/portfolio.json")
+    parser.add_argument("--photos", default="./data/photos.json", help="Catalogue export the site reads")
+    parser.add_argument(
+        "--assets",
+        default="./images/processed",
+        help="Converter output folder whose current file names are merged into records"
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Photo conversion and metadata tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="Convert images to WEBP/AVIF")
+    add_convert_arguments(convert)
+    convert.add_argument(
+        "--incremental",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Skip sources unchanged since the last run"
+    )
+    convert.add_argument("--report", action="store_true", help="Print per-stage timings and worker utilisation")
+    convert.add_argument("--trace", help="Write a Chrome trace of every stage to this file")
+    convert.add_argument("--profile", help="cProfile the workers, merged into convert.prof in this folder")
+    convert.set_defaults(func=run_convert)
+
+    watch = commands.add_parser("watch", help="Convert images as they land in a folder")
+    add_convert_arguments(watch)
+    watch.add_argument("--interval", type=float, default=1.0, help="Seconds between folder scans")
+    watch.add_argument(
+        "--settle",
+        type=float,
+        default=2.0,
+        help="Seconds a file's size and mtime must hold still before it is converted"
+    )
+    # Without the manifest every batch would redo the whole folder
+    watch.set_defaults(func=run_watch, incremental=True)
+
+    worker = commands.add_parser("worker", help="Convert from a folder shared with workers on other hosts")
+    add_convert_arguments(worker)
+    worker.add_argument("--lease", type=float, default=60.0, help="Seconds before a silent worker's files are reclaimed")
+    worker.add_argument("--poll", type=float, default=2.0, help="Seconds between scans while others hold the rest")
+    worker.add_argument("--follow", action="store_true", help="Keep waiting for new files instead of exiting")
+    worker.set_defaults(func=run_worker, incremental=True)
+
+    sort = commands.add_parser("sort", help="Sort JSON files by tdate")
+    sort.add_argument("directory", help="Directory with JSON files")
+    sort.add_argument("--order", choices=("newest", "oldest"), default="newest")
+    sort.add_argument("--save", action="store_true", help="Write sorted/ and combined_sorted.json")
+    sort.add_argument("--workers", type=int, default=None, help="Worker count, defaults to the core count")
+    sort.set_defaults(func=run_sort)
+
+    merge = commands.add_parser("merge", help="Merge metadata files into the catalogue, newest first")
+    merge.add_argument("sources", nargs="+", help="Metadata JSON arrays, later files win")
+    add_catalogue_arguments(merge)
+    merge.set_defaults(func=run_merge)
+
+    catalogue = commands.add_parser("catalogue", help="Import, sort, list or export the SQLite photo catalogue")
+    catalogue.add_argument("action", choices=("import", "export", "sort", "list"))
+    catalogue.add_argument("source", nargs="?", help="JSON array to import, replacing the catalogue")
+    add_catalogue_arguments(catalogue)
+    catalogue.add_argument("--force", action="store_true", help="Export even if nothing changed")
+    catalogue.add_argument("--order", choices=("udate", "tdate"), default="udate")
+    catalogue.add_argument("--oldest", action="store_true", help="Oldest first")
+    catalogue.add_argument("--season")
+    catalogue.add_argument("--tag")
+    catalogue.add_argument("--featured", action=argparse.BooleanOptionalAction, default=None)
+    catalogue.add_argument("--limit", type=int, default=None)
+    catalogue.set_defaults(func=run_catalogue)
+
+    index = commands.add_parser("index", help="Write the site's precomputed index files next to a catalogue")
+    index.add_argument("catalogue", nargs="?", default="./data/photos.json")
+    index.add_argument("--page-size", type=int, default=24)
+    index.set_defaults(func=run_index)
+
+    duplicates = commands.add_parser("duplicates", help="Find duplicate and near-duplicate images")
+    duplicates.add_argument("folder", help="Folder with images")
+    duplicates.add_argument("--method", choices=("dhash", "phash"), default="dhash")
+    duplicates.add_argument("--threshold", type=int, default=6, help="Max Hamming distance in bits")
+    duplicates.add_argument("--workers", type=int, default=None, help="Worker count, defaults to the core count")
+    duplicates.set_defaults(func=run_duplicates)
+
+    gui = commands.add_parser("gui", help="Open the Tk interface")
+    gui.set_defaults(func=run_gui)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
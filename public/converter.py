@@ -0,0 +1,477 @@
+
+import io
+import os
+import base64
+import multiprocessing
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from dataclasses import asdict, dataclass
+from PIL import Image, ImageOps, features
+from fileio import write_bytes_atomic, write_json_atomic
+from imaging import decoded_pixels, draft_for_target, get_orientation, oriented_size
+from manifest import ConversionManifest, hash_bytes
+from profiling import StageTimer, profiled, worker_id
+from quality import search_quality
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+BACKENDS = ('process', 'thread')
+OUTPUT_FORMATS = {'webp': 'WEBP', 'avif': 'AVIF'}
+DEFAULT_WIDTHS = (320, 640, 1280, 2560)
+VARIANTS_NAME = "variants.json"
+# Longest side of the inline placeholder image
+LQIP_SIZE = 20
+ROUTE_COPY = "copy"
+ROUTE_ORIENT = "orient"
+ROUTE_LOSSLESS = "lossless"
+ROUTE_LOSSY = "lossy"
+# Source modes treated as graphics rather than photographs
+GRAPHIC_MODES = ('1', 'P', 'PA', 'LA', 'RGBA')
+# For lossless WEBP, quality trades encode time for size
+LOSSLESS_EFFORT = 80
+# Hex digits of the content hash in hashed output names, e.g. 20250502_1.3f9a0c1e.webp
+HASH_NAME_LENGTH = 8
+
+
+@dataclass(frozen=True)
+class ConvertConfig:
+    """Settings for one conversion job, copied to every worker"""
+    output_dir: str
+    quality: int = 85
+    widths: tuple = ()
+    max_width: int = 0
+    placeholders: bool = True
+    formats: tuple = ('webp',)
+    # Encode WEBP both lossy and lossless and keep the smaller file
+    keep_smaller: bool = False
+    # Per-image quality search, replacing the fixed quality when set
+    target_kb: int = 0
+    target_ssim: float = 0.0
+    # Put a content hash in every output name, so published URLs never change meaning
+    hashed_names: bool = False
+
+    def encode_settings(self):
+        """Settings that change the encoded output, stored in the manifest"""
+        settings = asdict(self)
+        del settings["output_dir"]
+        # Lists so the settings compare equal after a JSON round trip
+        return {k: list(v) if isinstance(v, tuple) else v for k, v in settings.items()}
+
+
+def available_formats():
+    """Output formats the installed Pillow can encode"""
+    return tuple(f for f in OUTPUT_FORMATS if features.check(f))
+
+
+def parse_widths(text):
+    """Parse a comma separated width list such as '320,640'"""
+    widths = {int(w) for w in text.replace(" ", "").split(",") if w}
+    if any(w <= 0 for w in widths):
+        raise ValueError("Widths must be positive")
+    return tuple(sorted(widths))
+
+
+def list_images(folder):
+    """Return the convertible image filenames in a folder"""
+    return sorted(
+        f for f in os.listdir(folder)
+        if f.lower().endswith(IMAGE_EXTENSIONS)
+    )
+
+
+def select_sources(input_paths, manifest):
+    """Split inputs into sources, files the converter wrote, and (path, winner) pairs
+
+    Files this converter wrote, into the output folder or by an earlier
+    run into the input folder itself, are not sources. Sources that
+    share a stem write the same outputs, e.g. a.jpg and a.webp, so only
+    one is converted: the first in IMAGE_EXTENSIONS order among all such
+    files in its folder, not only those in this batch.
+    """
+    output_dir = os.path.abspath(manifest.output_dir)
+    written_by_folder = {}
+    preferred = {}
+    sources = []
+    written = []
+    shadowed = []
+    for path in input_paths:
+        folder, filename = os.path.split(os.path.abspath(path))
+        if folder not in written_by_folder:
+            source_manifest = manifest if folder == output_dir else ConversionManifest(folder)
+            written_by_folder[folder] = source_manifest.outputs()
+        own = written_by_folder[folder]
+        if filename in own:
+            written.append(path)
+            continue
+        if folder not in preferred:
+            preferred[folder] = {}
+            for name in sorted(list_images(folder), key=_extension_rank):
+                if name not in own:
+                    preferred[folder].setdefault(os.path.splitext(name)[0], name)
+        winner = preferred[folder].get(os.path.splitext(filename)[0], filename)
+        if winner != filename:
+            shadowed.append((path, winner))
+        else:
+            sources.append(path)
+    return sources, written, shadowed
+
+
+def _extension_rank(filename):
+    return IMAGE_EXTENSIONS.index(os.path.splitext(filename)[1].lower())
+
+
+def _resizable(img):
+    # Palette and CMYK sources must be expanded before resampling
+    if img.mode in ("RGB", "RGBA", "L", "LA"):
+        return img
+    has_alpha = img.mode.endswith("A") or "transparency" in img.info
+    return img.convert("RGBA" if has_alpha else "RGB")
+
+
+def make_placeholder(img):
+    """Tiny inline WEBP and dominant colour for a decoded image"""
+    small = img.convert("RGB") if img.mode != "RGB" else img.copy()
+    small.thumbnail((LQIP_SIZE, LQIP_SIZE), Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+    buffer = io.BytesIO()
+    small.save(buffer, format="WEBP", quality=40)
+    encoded = base64.b64encode(buffer.getvalue()).decode("ascii")
+
+    # Most common colour of a few-colour quantisation of the thumbnail
+    palette_img = small.quantize(colors=5)
+    count, index = max(palette_img.getcolors())
+    r, g, b = palette_img.getpalette()[index * 3:index * 3 + 3]
+    return {
+        "placeholder": f"data:image/webp;base64,{encoded}",
+        "color": f"#{r:02x}{g:02x}{b:02x}",
+    }
+
+
+def webp_is_lossless(data):
+    """True when a WEBP file holds a lossless (VP8L) bitstream"""
+    # RIFF chunks follow the 12 byte header, each padded to an even size
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk = data[offset:offset + 4]
+        if chunk in (b"VP8 ", b"VP8L"):
+            return chunk == b"VP8L"
+        size = int.from_bytes(data[offset + 4:offset + 8], "little")
+        offset += 8 + size + (size & 1)
+    return False
+
+
+def classify(img, data, config):
+    """Pick the encode route of a source from its header, before decoding
+
+    copy      WEBP already at size, upright and without metadata, with no
+              target or keep_smaller set: bytes copied
+    orient    WEBP already at size that only needs rotating, encoded the way
+              the source was (lossless stays lossless)
+    lossless  graphics: palette, alpha or lossless WEBP sources
+    lossy     photographs and everything else
+    """
+    width, _ = oriented_size(img)
+    fits = not config.max_width or width <= config.max_width
+    if img.format == "WEBP":
+        # Copying would also publish EXIF/XMP, which re-encoding strips
+        # A per-image target or a lossy/lossless trial needs an encode to act on
+        searched = config.target_kb or config.target_ssim or config.keep_smaller
+        if fits and not searched and get_orientation(img) == 1 and not ("exif" in img.info or "xmp" in img.info):
+            return ROUTE_COPY
+        if fits and get_orientation(img) != 1:
+            return ROUTE_ORIENT
+        return ROUTE_LOSSLESS if webp_is_lossless(data) else ROUTE_LOSSY
+    if img.format == "PNG" and (img.mode in GRAPHIC_MODES or "transparency" in img.info):
+        return ROUTE_LOSSLESS
+    return ROUTE_LOSSY
+
+
+def _encode(img, fmt, quality, lossless):
+    buffer = io.BytesIO()
+    if lossless and fmt == "webp":
+        img.save(buffer, format="WEBP", lossless=True, quality=LOSSLESS_EFFORT)
+    else:
+        img.save(buffer, format=OUTPUT_FORMATS[fmt], quality=quality)
+    return buffer.getvalue()
+
+
+def _write_variant(output_dir, name, fmt, content, size, hashed=False):
+    if hashed:
+        name = f"{name}.{hash_bytes(content)[:HASH_NAME_LENGTH]}"
+    output_path = os.path.join(output_dir, f"{name}.{fmt}")
+    # Renamed into place, so no reader or concurrent worker sees a partial file
+    write_bytes_atomic(output_path, content)
+    return {
+        "file": os.path.basename(output_path),
+        "format": fmt,
+        "width": size[0],
+        "height": size[1],
+        "bytes": len(content),
+    }
+
+
+def _save_variant(img, output_dir, name, fmt, quality, lossless=False, keep_smaller=False, timer=None, hashed=False):
+    timer = timer or StageTimer()
+    with timer.stage("encode"):
+        # AVIF is always lossy, only WEBP outputs have a lossless form
+        if keep_smaller and fmt == "webp":
+            content = min(_encode(img, fmt, quality, False), _encode(img, fmt, quality, True), key=len)
+        else:
+            content = _encode(img, fmt, quality, lossless)
+    with timer.stage("write"):
+        return _write_variant(output_dir, name, fmt, content, img.size, hashed)
+
+
+def convert_to_webp(input_path, config, profile_dir=None):
+    """Convert image to WEBP (and optional AVIF) plus width-bounded derivatives"""
+    filename = os.path.basename(input_path)
+    name_without_ext = os.path.splitext(filename)[0]
+    timer = StageTimer()
+
+    try:
+        with profiled(profile_dir, name_without_ext):
+            # Read once so the manifest hash costs no extra I/O
+            with timer.stage("read"):
+                stat = os.stat(input_path)
+                with open(input_path, "rb") as f:
+                    data = f.read()
+            with timer.stage("hash"):
+                source = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": hash_bytes(data)}
+
+            variants = []
+            placeholder = None
+            quality = None
+            with timer.stage("header"):
+                img = Image.open(io.BytesIO(data))
+            with img:
+                with timer.stage("header"):
+                    route = classify(img, data, config)
+                    lossless = route == ROUTE_LOSSLESS or (route == ROUTE_ORIENT and webp_is_lossless(data))
+                    full_width, full_height = oriented_size(img)
+                    main_width = full_width
+                    if config.max_width and config.max_width < full_width:
+                        main_width = config.max_width
+                        # Nothing larger than max_width is written, so skip decoding it
+                        draft_for_target(img, (main_width, round(full_height * main_width / full_width)))
+
+                encoded = config.formats
+                if route == ROUTE_COPY and "webp" in config.formats:
+                    with timer.stage("write"):
+                        variants.append(_write_variant(
+                            config.output_dir, name_without_ext, "webp", data, img.size, config.hashed_names
+                        ))
+                    encoded = tuple(f for f in config.formats if f != "webp")
+                widths = [w for w in config.widths if w < main_width]
+
+                # A copied file with nothing else to produce is never decoded
+                if encoded or widths or config.placeholders:
+                    # Decode and transpose once, every size is resampled from this image
+                    with timer.stage("decode"):
+                        img.load()
+                    if get_orientation(img) != 1:
+                        # In place frees the untransposed pixels instead of
+                        # keeping both copies alive
+                        with timer.stage("orient"):
+                            ImageOps.exif_transpose(img, in_place=True)
+                    base = img
+                    if img.width > main_width:
+                        with timer.stage("resize"):
+                            base = _resizable(img)
+                            main_height = max(1, round(base.height * main_width / base.width))
+                            base = base.resize((main_width, main_height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+                    quality = config.quality
+                    if (config.target_kb or config.target_ssim) and not lossless and encoded:
+                        # Searched once on the main size, derivatives reuse it
+                        with timer.stage("quality"):
+                            quality, _ = search_quality(
+                                _resizable(base), OUTPUT_FORMATS[encoded[0]], config.target_kb * 1024,
+                                config.target_ssim
+                            )
+                    for fmt in encoded:
+                        variants.append(_save_variant(
+                            base, config.output_dir, name_without_ext, fmt, quality, lossless, config.keep_smaller,
+                            timer, config.hashed_names
+                        ))
+                    # Reuses the pixels already in memory, costs well under a millisecond
+                    if config.placeholders:
+                        with timer.stage("placeholder"):
+                            placeholder = make_placeholder(base)
+
+                    if widths:
+                        base = _resizable(base)
+                        for width in widths:
+                            height = max(1, round(base.height * width / base.width))
+                            with timer.stage("resize"):
+                                resized = base.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+                            for fmt in config.formats:
+                                variants.append(_save_variant(
+                                    resized, config.output_dir, f"{name_without_ext}-{width}w", fmt, quality,
+                                    lossless, config.keep_smaller, timer, config.hashed_names
+                                ))
+        return {
+            "file": filename,
+            "id": name_without_ext,
+            "input": input_path,
+            "ok": True,
+            "route": route,
+            # Lossy quality used, None when nothing was lossy-encoded
+            "quality": quality if (encoded or widths) and not lossless else None,
+            # Main output first, its name carries the content hash when enabled
+            "output": os.path.join(config.output_dir, variants[0]["file"]) if variants else None,
+            "outputs": [os.path.join(config.output_dir, v["file"]) for v in variants],
+            "variants": variants,
+            "source": source,
+            "placeholder": placeholder,
+            "timings": timer.timings,
+            "spans": timer.spans,
+            "started": timer.started,
+            "busy": timer.elapsed(),
+            "worker": worker_id(),
+            "bytes_in": len(data),
+            "bytes_out": sum(v["bytes"] for v in variants),
+        }
+    except Exception as e:
+        return {"file": filename, "input": input_path, "ok": False, "error": str(e)}
+
+
+def convert_batch(input_paths, config, profile_dir=None):
+    """Convert a chunk of images inside one worker"""
+    return [convert_to_webp(path, config, profile_dir) for path in input_paths]
+
+
+class ConversionEngine:
+    """Runs convert_to_webp over many files on a thread or process pool"""
+
+    def __init__(self, config, backend="process", workers=None, chunksize=None, incremental=False,
+                 pixel_budget=None, profile_dir=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
+        missing = set(config.formats) - set(available_formats())
+        if missing:
+            raise ValueError(f"Pillow cannot encode: {', '.join(sorted(missing))}")
+        if config.target_kb < 0 or not 0 <= config.target_ssim < 1:
+            raise ValueError("Target size must be positive and target SSIM between 0 and 1")
+        self.config = config
+        self.backend = backend
+        self.workers = workers or os.cpu_count() or 1
+        self.chunksize = chunksize
+        self.incremental = incremental
+        # Upper bound on decoded pixels held by all workers at once
+        self.pixel_budget = pixel_budget
+        # Workers dump one cProfile file per image here when set
+        self.profile_dir = profile_dir
+
+    def make_executor(self):
+        """A pool for this engine's backend, reusable across run() calls"""
+        if self.backend == "process":
+            # Spawn keeps workers clear of the Tk thread state of the parent
+            context = multiprocessing.get_context("spawn")
+            return ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return ThreadPoolExecutor(max_workers=self.workers)
+
+    def _chunks(self, input_paths):
+        # Several chunks per worker keeps the pool balanced without paying
+        # a round trip per file
+        size = self.chunksize or max(1, min(32, len(input_paths) // (self.workers * 4)))
+        return [input_paths[i:i + size] for i in range(0, len(input_paths), size)]
+
+    def _run_chunked(self, executor, input_paths, handle):
+        futures = [
+            executor.submit(convert_batch, chunk, self.config, self.profile_dir)
+            for chunk in self._chunks(input_paths)
+        ]
+        for future in as_completed(futures):
+            for result in future.result():
+                handle(result)
+
+    def _run_budgeted(self, executor, input_paths, handle):
+        # Admit files while their decoded pixels fit in the budget. A file
+        # larger than the whole budget still runs, but only on its own.
+        with ThreadPoolExecutor(max_workers=8) as header_pool:
+            costs = list(header_pool.map(decoded_pixels, input_paths))
+        pending = list(zip(input_paths, costs))
+        running = {}
+        in_use = 0
+        while pending or running:
+            admitted = []
+            for path, cost in pending:
+                if len(running) >= self.workers:
+                    break
+                if running and in_use + cost > self.pixel_budget:
+                    continue
+                running[executor.submit(convert_to_webp, path, self.config, self.profile_dir)] = cost
+                in_use += cost
+                admitted.append(path)
+            if admitted:
+                admitted = set(admitted)
+                pending = [(p, c) for p, c in pending if p not in admitted]
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_use -= running.pop(future)
+                handle(future.result())
+
+    def run(self, input_paths, on_result=None, executor=None):
+        """Convert all files, calling on_result(result) as each one finishes
+
+        A caller-owned executor is used as is and left running, so repeated
+        small batches do not pay for a fresh pool each time.
+        """
+        input_paths = list(input_paths)
+        results = []
+        if not input_paths:
+            return results
+
+        os.makedirs(self.config.output_dir, exist_ok=True)
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+        settings = self.config.encode_settings()
+        manifest = ConversionManifest(self.config.output_dir)
+        input_paths, written, shadowed = select_sources(input_paths, manifest)
+        skips = [(path, "Output of an earlier conversion") for path in written]
+        for path, winner in shadowed:
+            # Its outputs, if any, belong to the source converted instead
+            manifest.forget(path)
+            skips.append((path, f"Same output name as {winner}, which is converted instead"))
+        for path, reason in skips:
+            result = {"file": os.path.basename(path), "input": path, "ok": True, "skipped": True, "reason": reason}
+            results.append(result)
+            if on_result:
+                on_result(result)
+        if self.incremental:
+            pending = []
+            for path in input_paths:
+                if manifest.is_current(path, settings):
+                    result = {"file": os.path.basename(path), "input": path, "ok": True, "skipped": True}
+                    results.append(result)
+                    if on_result:
+                        on_result(result)
+                else:
+                    pending.append(path)
+            input_paths = pending
+
+        def handle(result):
+            results.append(result)
+            if result["ok"]:
+                manifest.record(
+                    result["input"], result["source"], settings, result["variants"], result["placeholder"]
+                )
+            if on_result:
+                on_result(result)
+
+        try:
+            if input_paths:
+                with self.make_executor() if executor is None else nullcontext(executor) as pool:
+                    if self.pixel_budget:
+                        self._run_budgeted(pool, input_paths, handle)
+                    else:
+                        self._run_chunked(pool, input_paths, handle)
+        finally:
+            # Keep what finished even if the batch was interrupted
+            if manifest.dirty:
+                manifest.save()
+                write_json_atomic(
+                    os.path.join(self.config.output_dir, VARIANTS_NAME),
+                    manifest.variants_by_id(),
+                    separators=(",", ":")
+                )
+        return results
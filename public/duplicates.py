@@ -0,0 +1,228 @@
+
+import os
+import json
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
+from fileio import write_json_atomic
+from imaging import open_scaled
+
+HASH_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+HASH_METHODS = ('dhash', 'phash')
+CACHE_NAME = ".phash_cache.json"
+PHASH_SIZE = 32
+PHASH_LOW = 8
+PROXY_SIZE = 128
+
+
+def _gray_proxy(path):
+    # One reduced decode serves both hashes, JPEGs use DCT scaling for it
+    img, _ = open_scaled(path, (PROXY_SIZE, PROXY_SIZE))
+    with img:
+        ImageOps.exif_transpose(img, in_place=True)
+        img = img.convert("L")
+        img.thumbnail((PROXY_SIZE, PROXY_SIZE), Image.Resampling.BOX)
+        return img
+
+
+def dhash(img):
+    """64-bit difference hash of a 9x8 grayscale image"""
+    pixels = list(img.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def _dct_matrix(n):
+    return [
+        [math.cos(math.pi * (2 * x + 1) * u / (2 * n)) for x in range(n)]
+        for u in range(n)
+    ]
+
+
+_DCT = _dct_matrix(PHASH_SIZE)
+
+
+def phash(img):
+    """64-bit perceptual hash from the low frequencies of a 32x32 DCT"""
+    pixels = list(img.getdata())
+    rows = [pixels[i * PHASH_SIZE:(i + 1) * PHASH_SIZE] for i in range(PHASH_SIZE)]
+    # Only the top-left 8x8 coefficients are needed, so the separable DCT
+    # is computed for those rows and columns alone
+    partial = [
+        [sum(c * p for c, p in zip(_DCT[u], row)) for u in range(PHASH_LOW)]
+        for row in rows
+    ]
+    coefficients = [
+        sum(_DCT[v][y] * partial[y][u] for y in range(PHASH_SIZE))
+        for v in range(PHASH_LOW)
+        for u in range(PHASH_LOW)
+    ]
+    # The DC term would dominate the median
+    median = sorted(coefficients[1:])[len(coefficients[1:]) // 2]
+    value = 0
+    for c in coefficients:
+        value = (value << 1) | (c > median)
+    return value
+
+
+def hash_image(path):
+    """Both hashes of one image, computed inside a worker"""
+    try:
+        proxy = _gray_proxy(path)
+        return {
+            "dhash": dhash(proxy.resize((9, 8), Image.Resampling.LANCZOS)),
+            "phash": phash(proxy.resize((PHASH_SIZE, PHASH_SIZE), Image.Resampling.LANCZOS)),
+        }
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree over hashes for Hamming radius queries
+
+    The triangle inequality lets a query skip every subtree whose edge
+    distance lies outside [d - radius, d + radius].
+    """
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, value, item):
+        node = [value, [item], {}]
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            distance = hamming(value, current[0])
+            if distance == 0:
+                current[1].append(item)
+                return
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, value, radius):
+        """Items within radius, as (distance, item) pairs"""
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node_value, items, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= radius:
+                found.extend((distance, item) for item in items)
+            for edge, child in children.items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return found
+
+
+class HashCache:
+    """Hashes per file of a folder, reused while size and mtime match"""
+
+    def __init__(self, folder):
+        self.path = os.path.join(folder, CACHE_NAME)
+        self.entries = {}
+        self.dirty = False
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                self.entries = {}
+
+    def get(self, filename, stat):
+        entry = self.entries.get(filename)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["hashes"]
+        return None
+
+    def put(self, filename, stat, hashes):
+        self.entries[filename] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hashes": hashes}
+        self.dirty = True
+
+    def save(self):
+        if self.dirty:
+            write_json_atomic(self.path, self.entries)
+            self.dirty = False
+
+
+def folder_hashes(folder, workers=None):
+    """Hashes for every image in a folder, computing only uncached ones"""
+    filenames = sorted(f for f in os.listdir(folder) if f.lower().endswith(HASH_EXTENSIONS))
+    cache = HashCache(folder)
+    hashes = {}
+    missing = []
+    for filename in filenames:
+        stat = os.stat(os.path.join(folder, filename))
+        cached = cache.get(filename, stat)
+        if cached:
+            hashes[filename] = cached
+        else:
+            missing.append((filename, stat))
+
+    if missing:
+        workers = workers or os.cpu_count() or 1
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            paths = [os.path.join(folder, f) for f, _ in missing]
+            chunksize = max(1, len(paths) // (workers * 4))
+            for (filename, stat), result in zip(missing, executor.map(hash_image, paths, chunksize=chunksize)):
+                if "error" not in result:
+                    cache.put(filename, stat, result)
+                    hashes[filename] = result
+        cache.save()
+    return hashes
+
+
+def find_duplicates(folder, threshold=6, method="dhash", workers=None):
+    """Groups of images whose hashes are within threshold bits of each other
+
+    Each group is a list of (filename, distance to the group's first file).
+    """
+    if method not in HASH_METHODS:
+        raise ValueError(f"Unknown hash method: {method}")
+    hashes = folder_hashes(folder, workers)
+
+    tree = BKTree()
+    parent = {}
+
+    def find(name):
+        while parent[name] != name:
+            parent[name] = parent[parent[name]]
+            name = parent[name]
+        return name
+
+    # Query before inserting, so each pair is found once
+    for filename, values in hashes.items():
+        value = values[method]
+        parent[filename] = filename
+        for _, other in tree.search(value, threshold):
+            parent[find(other)] = find(filename)
+        tree.add(value, filename)
+
+    groups = {}
+    for filename in hashes:
+        groups.setdefault(find(filename), []).append(filename)
+
+    result = []
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        members.sort()
+        first = hashes[members[0]][method]
+        result.append([(name, hamming(first, hashes[name][method])) for name in members])
+    result.sort(key=lambda group: group[0][0])
+    return result
@@ -0,0 +1,46 @@
+
+import os
+import json
+import tempfile
+
+
+def _creation_mode():
+    # umask can only be read by setting it, done once at import before any threads
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+# Mode open() would give a new file; mkstemp always uses 0600
+FILE_MODE = _creation_mode()
+
+
+def write_json_atomic(path, data, **kwargs):
+    """Write JSON next to the target and move it into place"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    content = json.dumps(data, ensure_ascii=False, **kwargs).encode("utf-8")
+    write_bytes_atomic(path, content, fsync=True)
+
+
+def write_bytes_atomic(path, content, fsync=False):
+    """Write bytes under a temporary name and rename them into place
+
+    Readers, and other workers writing the same file, only ever see a
+    complete file. fsync is optional because the rename alone is enough
+    for that; it only adds durability across a power loss.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        # Readable by the web server and by other hosts' users, like img.save output
+        os.fchmod(fd, FILE_MODE)
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
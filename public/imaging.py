@@ -0,0 +1,120 @@
+
+from concurrent.futures import ThreadPoolExecutor
+from PIL import ExifTags, Image
+
+ORIENTATION_TAG = 0x0112
+# EXIF orientations that swap width and height once applied
+SWAPPED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def get_orientation(img):
+    """EXIF orientation from the header, 1 when absent"""
+    try:
+        return img.getexif().get(ORIENTATION_TAG, 1) or 1
+    except Exception:
+        return 1
+
+
+def oriented_size(img):
+    """Image size as displayed, read from the header without decoding"""
+    width, height = img.size
+    if get_orientation(img) in SWAPPED_ORIENTATIONS:
+        return height, width
+    return width, height
+
+
+def decoded_pixels(path):
+    """Pixel count of an image once decoded, read from the header
+
+    Unreadable files count as zero so they fail fast in a worker instead
+    of blocking admission.
+    """
+    try:
+        with Image.open(path) as img:
+            return img.width * img.height
+    except Exception:
+        return 0
+
+
+def fit_size(size, box):
+    """Size of an image scaled down to fit a box, like Image.thumbnail"""
+    width, height = size
+    scale = min(box[0] / width, box[1] / height, 1)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def draft_for_target(img, target_size):
+    """Let a JPEG decode at reduced resolution when the target is much smaller
+
+    DCT scaling picks the smallest power-of-two scale whose result is still
+    at least the requested size, so asking for twice the target keeps
+    enough pixels for a clean LANCZOS pass afterwards. Must be called
+    before the image is loaded; non-JPEG images are left untouched.
+    """
+    width, height = target_size
+    if get_orientation(img) in SWAPPED_ORIENTATIONS:
+        width, height = height, width
+    requested = (width * 2, height * 2)
+    if requested[0] >= img.width or requested[1] >= img.height:
+        return False
+    return img.draft(img.mode, requested) is not None
+
+
+def open_scaled(fp, box):
+    """Open an image decoded just large enough to fill a bounding box
+
+    Returns the image and its full display size, which is read from the
+    header before any reduction.
+    """
+    img = Image.open(fp)
+    full_size = oriented_size(img)
+    draft_for_target(img, fit_size(full_size, box))
+    return img, full_size
+
+
+def _exif_text(value):
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", "ignore")
+    if not isinstance(value, str):
+        return None
+    # Camera firmware pads fields with NULs and spaces
+    value = value.strip("\x00 ").strip()
+    return value or None
+
+
+def _exif_date(value):
+    value = _exif_text(value)
+    # EXIF writes "YYYY:MM:DD HH:MM:SS"
+    if not value or len(value) < 10 or value[4] != ":" or value[7] != ":":
+        return None
+    date = value[:10].replace(":", "-")
+    return date if date[:4].isdigit() and date[5:7].isdigit() and date[8:10].isdigit() else None
+
+
+def read_header(path):
+    """Camera, lens, capture date, orientation and size without decoding pixels"""
+    with Image.open(path) as img:
+        exif = img.getexif()
+        orientation = get_orientation(img)
+        width, height = oriented_size(img)
+    details = exif.get_ifd(ExifTags.IFD.Exif)
+    return {
+        "camera": _exif_text(exif.get(ExifTags.Base.Model)),
+        "lens": _exif_text(details.get(ExifTags.Base.LensModel)),
+        "tdate": _exif_date(details.get(ExifTags.Base.DateTimeOriginal) or exif.get(ExifTags.Base.DateTime)),
+        "orientation": orientation,
+        "dimension": f"{width}x{height}",
+    }
+
+
+def read_headers(paths, workers=8):
+    """read_header for many files in parallel, errors are reported per file"""
+    def safe_read(path):
+        try:
+            return read_header(path)
+        except Exception as e:
+            return {"error": str(e)}
+
+    paths = list(paths)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(paths, executor.map(safe_read, paths)))
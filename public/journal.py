@@ -0,0 +1,78 @@
+
+import os
+import json
+import time
+
+JOURNAL_NAME = ".metadata_journal.jsonl"
+FSYNC_POLICIES = ('always', 'interval', 'never')
+# With the interval policy, at most this many seconds of edits can be lost
+FSYNC_INTERVAL = 1.0
+
+
+class EditJournal:
+    """Append-only log of editor records, replayed after a crash
+
+    Every edit is one JSON line appended to the file, so saving an edit
+    costs the same however many photos the folder holds. The last record
+    for an id wins on replay. An explicit save writes the real metadata
+    files and then empties the journal.
+    """
+
+    def __init__(self, path, fsync="always"):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.path = path
+        self.fsync = fsync
+        self._file = None
+        self._synced = 0.0
+
+    def replay(self):
+        """Records logged since the last compaction, by id"""
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    # A line cut short by a crash, everything before it is intact
+                    continue
+                if isinstance(record, dict) and "id" in record:
+                    records[record["id"]] = record
+        return records
+
+    def append(self, *records):
+        """Log records, durable on return under the 'always' policy"""
+        if not records:
+            return
+        if self._file is None:
+            self._file = open(self.path, "ab+")
+            # End a line cut short by a crash, or the next record would join it
+            if self._file.tell():
+                self._file.seek(-1, os.SEEK_END)
+                if self._file.read(1) != b"\n":
+                    self._file.write(b"\n")
+        lines = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        self._file.write(lines.encode("utf-8"))
+        self._file.flush()
+        now = time.monotonic()
+        if self.fsync == "always" or (self.fsync == "interval" and now - self._synced >= FSYNC_INTERVAL):
+            os.fsync(self._file.fileno())
+            self._synced = now
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            if self.fsync != "never":
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def compact(self):
+        """Drop the log once its records are saved to the metadata files"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
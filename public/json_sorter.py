@@ -0,0 +1,192 @@
+
+import os
+import json
+import heapq
+import shutil
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from functools import lru_cache
+
+COMBINED_NAME = "combined_sorted.json"
+SORTED_DIR = "sorted"
+# Runs merged at once, keeps open file handles bounded
+MERGE_FAN_IN = 128
+
+
+@lru_cache(maxsize=8192)
+def parse_tdate(value):
+    """Validate a YYYY-MM-DD date and return it zero-padded as its sort key
+
+    Zero-padded ISO dates sort correctly as strings. Month and day may
+    have one digit, as strptime('%Y-%m-%d') allowed, and are padded so
+    "2020-2-3" sorts with "2020-02-03".
+    """
+    parts = value.split('-')
+    if len(parts) != 3 or len(parts[0]) != 4 or not all(1 <= len(p) <= 2 for p in parts[1:]):
+        raise ValueError(f"Not a YYYY-MM-DD date: {value!r}")
+    if not all(p.isascii() and p.isdigit() for p in parts):
+        raise ValueError(f"Not a YYYY-MM-DD date: {value!r}")
+    return date(int(parts[0]), int(parts[1]), int(parts[2])).isoformat()
+
+
+def _dated_items(data):
+    items = data if isinstance(data, list) else [data] if isinstance(data, dict) else []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        tdate = item.get('tdate')
+        if not isinstance(tdate, str):
+            continue
+        try:
+            yield parse_tdate(tdate), item
+        except ValueError:
+            continue
+
+
+def _write_json_array(f, items):
+    # Same layout as json.dump(items, f, indent=2), one item at a time
+    first = True
+    for item in items:
+        f.write("[\n  " if first else ",\n  ")
+        f.write(json.dumps(item, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+        first = False
+    f.write("[]" if first else "\n]")
+
+
+def sort_file(filepath, reverse, output_dir=None, run_dir=None):
+    """Sort one JSON file by tdate inside a worker
+
+    With output_dir the sorted items are written there under the same
+    name, with run_dir they are also written as a JSON-lines run for the
+    combined merge. Only a small summary travels back to the caller.
+    """
+    filename = os.path.basename(filepath)
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (json.JSONDecodeError, UnicodeDecodeError, OSError) as e:
+        return {"file": filename, "path": filepath, "error": str(e)}
+
+    items = list(_dated_items(data))
+    del data
+    items.sort(key=lambda x: x[0], reverse=reverse)
+    summary = {"file": filename, "path": filepath, "count": len(items), "run": None}
+    if not items:
+        return summary
+    summary["first"] = items[0][0]
+    summary["last"] = items[-1][0]
+
+    if output_dir:
+        with open(os.path.join(output_dir, filename), 'w', encoding='utf-8') as f:
+            json.dump([item for _, item in items], f, ensure_ascii=False, indent=2)
+    if run_dir:
+        run_path = os.path.join(run_dir, filename + ".jsonl")
+        with open(run_path, 'w', encoding='utf-8') as f:
+            # The normalised key travels with the item, so the merge orders
+            # runs exactly as they were sorted
+            for entry in items:
+                f.write(json.dumps(entry, ensure_ascii=False))
+                f.write("\n")
+        summary["run"] = run_path
+    return summary
+
+
+def _read_run(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _merged(paths, reverse):
+    # Run lines are [key, item] pairs
+    return heapq.merge(*(_read_run(p) for p in paths), key=lambda entry: entry[0], reverse=reverse)
+
+
+def merge_runs(run_paths, output_path, reverse, run_dir, fan_in=MERGE_FAN_IN):
+    """K-way merge sorted runs into one JSON array using bounded memory"""
+    runs = list(run_paths)
+    level = 0
+    # Merge in passes while there are more runs than handles we allow open
+    while len(runs) > fan_in:
+        merged = []
+        for i in range(0, len(runs), fan_in):
+            group = runs[i:i + fan_in]
+            path = os.path.join(run_dir, f"merge-{level}-{i // fan_in}.jsonl")
+            with open(path, 'w', encoding='utf-8') as f:
+                for entry in _merged(group, reverse):
+                    f.write(json.dumps(entry, ensure_ascii=False))
+                    f.write("\n")
+            for p in group:
+                os.remove(p)
+            merged.append(path)
+        runs = merged
+        level += 1
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        _write_json_array(f, (item for _, item in _merged(runs, reverse)))
+
+
+def list_json_files(directory):
+    """JSON files of a directory in listing order"""
+    return [
+        os.path.join(directory, f) for f in os.listdir(directory)
+        if f.endswith('.json') and os.path.isfile(os.path.join(directory, f))
+    ]
+
+
+def sort_directory(directory, newest_first=True, save=False, workers=None, on_file=None):
+    """Sort all JSON files of a directory by tdate
+
+    Files are parsed and sorted in a process pool. When saving, each file
+    is written to sorted/ and combined_sorted.json is produced by merging
+    the per-file runs, so no step holds every item in memory. Returns the
+    per-file summaries ordered like the combined output, plus errors.
+    """
+    paths = list_json_files(directory)
+    reverse = newest_first
+    output_dir = None
+    run_dir = None
+    if save:
+        output_dir = os.path.join(directory, SORTED_DIR)
+        os.makedirs(output_dir, exist_ok=True)
+        run_dir = tempfile.mkdtemp(prefix=".runs-", dir=output_dir)
+
+    summaries = []
+    errors = []
+    run_paths = []
+    try:
+        if paths:
+            context = multiprocessing.get_context("spawn")
+            workers = workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=min(workers, len(paths)), mp_context=context) as executor:
+                chunksize = max(1, len(paths) // (workers * 4))
+                args = ([reverse] * len(paths), [output_dir] * len(paths), [run_dir] * len(paths))
+                # map keeps listing order, which decides ties like a stable sort would
+                for summary in executor.map(sort_file, paths, *args, chunksize=chunksize):
+                    if "error" in summary:
+                        errors.append(summary)
+                    elif summary["count"]:
+                        summaries.append(summary)
+                        run_paths.append(summary["run"])
+                    if on_file:
+                        on_file(summary)
+
+        summaries.sort(key=lambda s: s["first"], reverse=reverse)
+        if save:
+            merge_runs(
+                run_paths,
+                os.path.join(output_dir, COMBINED_NAME),
+                reverse,
+                run_dir
+            )
+    finally:
+        if run_dir:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+    return {
+        "files": summaries,
+        "errors": errors,
+        "total": sum(s["count"] for s in summaries),
+    }
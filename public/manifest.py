@@ -0,0 +1,161 @@
+
+import os
+import json
+import hashlib
+
+from fileio import write_json_atomic
+
+MANIFEST_NAME = ".conversion_manifest.json"
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_bytes(data):
+    """Content hash used to recognise unchanged sources"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def hash_file(path):
+    """Hash a file in blocks without reading it into memory at once"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ConversionManifest:
+    """Per output folder record of converted sources and their settings"""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.entries = {}
+        self.dirty = False
+        # Outputs of earlier conversions that the latest ones replaced, kept
+        # on disk until no published record points at them
+        self.superseded = set()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = data.get("files", {})
+            self.superseded = set(data.get("superseded", []))
+        except (json.JSONDecodeError, UnicodeDecodeError, AttributeError):
+            # A damaged manifest only costs one full re-encode
+            self.entries = {}
+
+    def save(self):
+        if self.dirty:
+            write_json_atomic(
+                self.path, {"version": 1, "files": self.entries, "superseded": sorted(self.superseded)}
+            )
+            self.dirty = False
+
+    def is_current(self, input_path, settings):
+        """True when the source and settings match the recorded conversion"""
+        entry = self.entries.get(os.path.basename(input_path))
+        if not entry or entry.get("settings") != settings:
+            return False
+        variants = entry.get("variants", [])
+        if not variants or not all(self._intact(v) for v in variants):
+            return False
+
+        stat = os.stat(input_path)
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime_ns == entry["mtime_ns"]:
+            return True
+
+        # Touched but possibly identical, fall back to the content hash
+        if hash_file(input_path) != entry["hash"]:
+            return False
+        entry["mtime_ns"] = stat.st_mtime_ns
+        self.dirty = True
+        return True
+
+    def _intact(self, variant):
+        # A size mismatch means something else overwrote the output since
+        try:
+            return os.path.getsize(os.path.join(self.output_dir, variant["file"])) == variant["bytes"]
+        except OSError:
+            return False
+
+    def outputs(self):
+        """Every file name conversions into this folder wrote, replaced ones included"""
+        return {v["file"] for entry in self.entries.values() for v in entry.get("variants", [])} | self.superseded
+
+    def forget(self, input_path):
+        """Drop the entry of a source that is no longer converted, keeping its files"""
+        if self.entries.pop(os.path.basename(input_path), None) is not None:
+            self.dirty = True
+
+    def record(self, input_path, source, settings, variants, placeholder=None):
+        """Remember a successful conversion and the files it produced"""
+        name = os.path.basename(input_path)
+        previous = {v["file"] for v in self.entries.get(name, {}).get("variants", [])}
+        current = {v["file"] for v in variants}
+        self.superseded |= previous - current
+        self.superseded -= current
+        self.entries[name] = {
+            "size": source["size"],
+            "mtime_ns": source["mtime_ns"],
+            "hash": source["hash"],
+            "settings": settings,
+            "variants": variants,
+            "placeholder": placeholder,
+        }
+        self.dirty = True
+
+    def variants_by_id(self):
+        """Map photo id to its produced files, as published in variants.json"""
+        return {
+            os.path.splitext(name)[0]: entry.get("variants", [])
+            for name, entry in sorted(self.entries.items())
+        }
+
+    def remove_superseded(self, referenced=()):
+        """Delete replaced outputs that neither a conversion nor a record uses
+
+        With hashed names every re-encode leaves the old files behind, and
+        changed widths or formats do the same without them. Names in
+        referenced, those published records still link, are kept for a
+        later call. Returns the number of files removed.
+        """
+        in_use = {v["file"] for entry in self.entries.values() for v in entry.get("variants", [])}
+        removable = self.superseded - in_use - set(referenced)
+        removed = 0
+        for name in removable:
+            try:
+                os.remove(os.path.join(self.output_dir, name))
+                removed += 1
+            except FileNotFoundError:
+                pass
+        if removable or self.superseded & in_use:
+            self.superseded -= removable | in_use
+            self.dirty = True
+            self.save()
+        return removed
+
+    def photo_assets(self):
+        """Placeholder and asset fields per photo id, merged into metadata records
+
+        assets maps each full-size format to its current file name and
+        byte size, so the site links the hashed names.
+        """
+        found = {}
+        for name, entry in self.entries.items():
+            fields = dict(entry.get("placeholder") or {})
+            width = max((v["width"] for v in entry.get("variants", [])), default=0)
+            assets = {
+                v["format"]: {"file": v["file"], "bytes": v["bytes"]}
+                for v in entry.get("variants", []) if v["width"] == width
+            }
+            if assets:
+                fields["assets"] = assets
+            if fields:
+                found[os.path.splitext(name)[0]] = fields
+        return found
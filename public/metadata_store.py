@@ -0,0 +1,68 @@
+
+import os
+import json
+
+
+class MetadataStore:
+    """A metadata JSON array parsed once and indexed by photo id
+
+    The file is parsed again only when its mtime or size changes, so
+    lookups while browsing a folder are dictionary hits.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        self._signature = None
+
+    def refresh(self):
+        """Reload the file if it changed on disk since the last read"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            self.records = {}
+            self._signature = None
+            return
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return
+
+        records = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for item in data if isinstance(data, list) else []:
+                if isinstance(item, dict) and "id" in item:
+                    records[item["id"]] = item
+        except (json.JSONDecodeError, UnicodeDecodeError, OSError):
+            # Unreadable file behaves like an empty one until it changes
+            records = {}
+        self.records = records
+        self._signature = signature
+
+    def get(self, file_id):
+        """Record for a photo id, or None"""
+        self.refresh()
+        return self.records.get(file_id)
+
+
+def merge_records(existing, items):
+    """Put items first, followed by existing records they do not replace
+
+    Same newest-first result as removing and re-inserting each item at the
+    front, done in one pass.
+    """
+    new_ids = {item["id"] for item in items}
+    return list(items) + [x for x in existing if x.get("id") not in new_ids]
+
+
+def load_records(path):
+    """Read a metadata JSON array, empty when missing or unreadable"""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError:
+            return []
+    return data if isinstance(data, list) else []
@@ -0,0 +1,67 @@
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from imaging import open_scaled
+
+
+def load_preview(path, box):
+    """Decode a display-ready thumbnail and the full oriented size"""
+    img, full_size = open_scaled(path, box)
+    with img:
+        ImageOps.exif_transpose(img, in_place=True)
+        img.thumbnail(box, Image.Resampling.LANCZOS)
+        img.load()
+    return img, full_size
+
+
+class PreviewCache:
+    """Bounded LRU of preview thumbnails decoded on background threads
+
+    Entries are keyed by path and mtime, so an edited file is decoded
+    again. Values are futures; callers poll them instead of blocking the
+    Tk thread, which only wraps finished images in PhotoImage.
+    """
+
+    def __init__(self, box=(400, 400), capacity=32, workers=2):
+        self.box = box
+        self.capacity = capacity
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preview")
+
+    def request(self, path):
+        """Return the future for a preview, scheduling the decode if needed"""
+        try:
+            key = (path, os.stat(path).st_mtime_ns)
+        except OSError:
+            key = (path, None)
+
+        with self._lock:
+            future = self._items.get(key)
+            if future is None:
+                future = self._executor.submit(load_preview, path, self.box)
+                self._items[key] = future
+            self._items.move_to_end(key)
+
+            while len(self._items) > self.capacity:
+                _, evicted = self._items.popitem(last=False)
+                evicted.cancel()
+        return future
+
+    def prefetch(self, paths):
+        """Queue decodes for images the user is likely to open next"""
+        for path in paths:
+            self.request(path)
+
+    def clear(self):
+        with self._lock:
+            for future in self._items.values():
+                future.cancel()
+            self._items.clear()
+
+    def shutdown(self):
+        self.clear()
+        self._executor.shutdown(wait=False)
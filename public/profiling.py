@@ -0,0 +1,154 @@
+
+import os
+import json
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+
+# Stages in pipeline order, used to lay out reports
+STAGES = ('read', 'hash', 'header', 'decode', 'orient', 'resize', 'quality', 'encode', 'write', 'placeholder')
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def latency_summary(seconds):
+    return {
+        "p50_ms": round(percentile(seconds, 50) * 1000, 2),
+        "p95_ms": round(percentile(seconds, 95) * 1000, 2),
+        "max_ms": round(max(seconds, default=0) * 1000, 2),
+    }
+
+
+def worker_id():
+    """Process and thread of the caller, so both backends report workers"""
+    return f"{os.getpid()}:{threading.get_ident()}"
+
+
+class StageTimer:
+    """Wall time per pipeline stage of one file
+
+    Spans keep wall-clock starts so files timed in different worker
+    processes line up on one trace.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._origin = time.perf_counter()
+        self.timings = {}
+        self.spans = []
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self.timings[name] = self.timings.get(name, 0.0) + duration
+            self.spans.append((name, self.started + start - self._origin, duration))
+
+    def elapsed(self):
+        return time.perf_counter() - self._origin
+
+
+@contextmanager
+def profiled(profile_dir, name):
+    """cProfile the block into profile_dir/name.prof when a directory is given"""
+    if not profile_dir:
+        yield
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ allows one active profiler, so with the thread
+        # backend only one file at a time is profiled
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(os.path.join(profile_dir, f"{name}.prof"))
+
+
+def merge_profiles(profile_dir, output_path):
+    """Combine the per-file profiles of a run into one pstats file"""
+    paths = [
+        os.path.join(profile_dir, f) for f in sorted(os.listdir(profile_dir))
+        if f.endswith(".prof") and os.path.join(profile_dir, f) != output_path
+    ]
+    if not paths:
+        return 0
+    stats = pstats.Stats(*paths)
+    stats.dump_stats(output_path)
+    for path in paths:
+        os.remove(path)
+    return len(paths)
+
+
+def pipeline_report(results, workers, started, elapsed):
+    """Per-stage percentiles, worker utilisation and throughput for one run
+
+    started and elapsed are the wall-clock start and duration of the run as
+    seen by the caller; results are those returned by ConversionEngine.run.
+    """
+    timed = [r for r in results if r.get("timings")]
+    stages = {}
+    for stage in STAGES:
+        values = [r["timings"][stage] for r in timed if stage in r["timings"]]
+        if values:
+            stages[stage] = {**latency_summary(values), "total_s": round(sum(values), 3)}
+
+    busy = sum(r["busy"] for r in timed)
+    capacity = workers * elapsed
+    bytes_in = sum(r["bytes_in"] for r in timed)
+    bytes_out = sum(r["bytes_out"] for r in timed)
+    return {
+        "files": len(timed),
+        "elapsed_s": round(elapsed, 3),
+        "stages": stages,
+        # Time from the start of the run until a worker picked the file up
+        "queue_wait": latency_summary([max(0.0, r["started"] - started) for r in timed]),
+        "workers": {
+            "count": workers,
+            "seen": len({r["worker"] for r in timed}),
+            "busy_s": round(busy, 3),
+            "idle_s": round(max(0.0, capacity - busy), 3),
+            "busy_pct": round(100 * busy / capacity, 1) if capacity else 0.0,
+        },
+        "mb_in_per_s": round(bytes_in / 1e6 / elapsed, 2) if elapsed else 0.0,
+        "mb_out_per_s": round(bytes_out / 1e6 / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def write_chrome_trace(results, path):
+    """Write stage spans as Chrome trace events, viewable in Perfetto or chrome://tracing"""
+    events = []
+    lanes = {}
+    for result in results:
+        if not result.get("spans"):
+            continue
+        pid = result["worker"].split(":")[0]
+        tid = lanes.setdefault(result["worker"], len(lanes) + 1)
+        events.append({
+            "name": result["file"], "ph": "X", "pid": int(pid), "tid": tid,
+            "ts": result["started"] * 1e6, "dur": result["busy"] * 1e6, "cat": "file",
+        })
+        for name, start, duration in result["spans"]:
+            events.append({
+                "name": name, "ph": "X", "pid": int(pid), "tid": tid,
+                "ts": start * 1e6, "dur": duration * 1e6, "cat": "stage",
+            })
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return len(events)
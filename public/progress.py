@@ -0,0 +1,69 @@
+
+import time
+import queue
+
+
+class ProgressChannel:
+    """Log lines and progress pushed from any thread, drained by the UI
+
+    Workers only enqueue tuples, the Tk thread pulls them in batches on a
+    timer, so conversions never wait for a redraw.
+    """
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+
+    def log(self, message):
+        self._queue.put(("log", message))
+
+    def start(self, total):
+        self._queue.put(("start", total))
+
+    def advance(self, count=1):
+        self._queue.put(("advance", count))
+
+    def finish(self, message):
+        self._queue.put(("finish", message))
+
+    def drain(self, limit=1000):
+        """Return up to limit pending events without blocking"""
+        events = []
+        try:
+            while len(events) < limit:
+                events.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return events
+
+
+class ProgressStats:
+    """Files per second and ETA for a running batch"""
+
+    def __init__(self, total=0):
+        self.total = total
+        self.done = 0
+        self.started = time.monotonic()
+
+    def advance(self, count=1):
+        self.done += count
+
+    @property
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        """Seconds left at the current rate, None until there is a rate"""
+        rate = self.rate
+        if not rate:
+            return None
+        return max(0.0, (self.total - self.done) / rate)
+
+    def describe(self):
+        text = f"{self.done}/{self.total} files, {self.rate:.1f} files/s"
+        eta = self.eta
+        if eta is not None and self.done < self.total:
+            minutes, seconds = divmod(int(eta), 60)
+            text += f", ETA {minutes}:{seconds:02d}"
+        return text
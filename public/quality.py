@@ -0,0 +1,114 @@
+
+import io
+from PIL import Image, ImageMath
+from imaging import fit_size
+
+QUALITY_MIN = 30
+QUALITY_MAX = 95
+# Longest side of the image the search encodes, the final encode is full size
+PROXY_SIZE = 1024
+SSIM_BLOCK = 8
+# Full-size encodes spent correcting the proxy's size estimate
+CALIBRATION_ROUNDS = 3
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+
+
+def _product(a, b):
+    return ImageMath.lambda_eval(lambda e: e["a"] * e["b"], a=a, b=b)
+
+
+def ssim(reference, distorted, block=SSIM_BLOCK):
+    """Mean luma SSIM of two same-sized images over non-overlapping blocks
+
+    Block statistics come from Image.reduce on float images, so only the
+    final map of one value per block is summed in Python.
+    """
+    x = reference.convert("L").convert("F")
+    y = distorted.convert("L").convert("F")
+    mx, my = x.reduce(block), y.reduce(block)
+    xx = _product(x, x).reduce(block)
+    yy = _product(y, y).reduce(block)
+    xy = _product(x, y).reduce(block)
+    score = ImageMath.lambda_eval(
+        lambda e: (2 * e["mx"] * e["my"] + _C1) * (2 * (e["xy"] - e["mx"] * e["my"]) + _C2)
+        / ((e["mx"] * e["mx"] + e["my"] * e["my"] + _C1)
+           * (e["xx"] - e["mx"] * e["mx"] + e["yy"] - e["my"] * e["my"] + _C2)),
+        mx=mx, my=my, xx=xx, yy=yy, xy=xy
+    )
+    # ImageStat bins float images into a histogram, so sum the map directly
+    return sum(score.getdata()) / (score.width * score.height)
+
+
+def search_quality(img, image_format="WEBP", target_bytes=0, target_ssim=0.0):
+    """Encoder quality for one image, found by bisection on a reduced proxy
+
+    With target_bytes this is the highest quality whose size, scaled up
+    from the proxy, fits the target. Bytes per pixel differ between the
+    proxy and the full image, so the scale is corrected from full-size
+    encodes at the pick, at most CALIBRATION_ROUNDS times. Most images
+    then land within 10% of the target; WEBP size can jump 25% between
+    adjacent qualities, so some land that far off. With target_ssim it
+    is the lowest quality whose proxy reaches the score.
+    Returns the quality and the estimated size or score at it.
+    """
+    proxy = img
+    if max(img.size) > PROXY_SIZE:
+        proxy = img.resize(fit_size(img.size, (PROXY_SIZE, PROXY_SIZE)), Image.Resampling.BOX)
+    scale = img.width * img.height / (proxy.width * proxy.height)
+
+    def encoded_size(image, quality):
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format, quality=quality)
+        return buffer.tell()
+
+    def measure(quality):
+        if not target_ssim:
+            return encoded_size(proxy, quality) * scale
+        buffer = io.BytesIO()
+        proxy.save(buffer, format=image_format, quality=quality)
+        buffer.seek(0)
+        with Image.open(buffer) as decoded:
+            return ssim(proxy, decoded)
+
+    def bisect():
+        # Size and score both rise with quality, so either target splits
+        # the range into a passing and a failing side
+        low, high = QUALITY_MIN, QUALITY_MAX
+        best = None
+        while low <= high:
+            quality = (low + high) // 2
+            value = measure(quality)
+            if target_ssim:
+                passed = value >= target_ssim
+                if passed:
+                    high = quality - 1
+                else:
+                    low = quality + 1
+            else:
+                passed = value <= target_bytes
+                if passed:
+                    low = quality + 1
+                else:
+                    high = quality - 1
+            if passed:
+                best = (quality, value)
+        if best is None:
+            # Unreachable target: the best score, or the smallest file
+            quality = QUALITY_MAX if target_ssim else QUALITY_MIN
+            best = (quality, measure(quality))
+        return best
+
+    best = bisect()
+    if not target_ssim and proxy is not img:
+        # Correct the scale from full-size encodes at the pick until it settles
+        for _ in range(CALIBRATION_ROUNDS):
+            quality, estimate = best
+            actual = encoded_size(img, quality)
+            if not estimate:
+                break
+            scale *= actual / estimate
+            best = bisect()
+            if best[0] == quality:
+                break
+    return best
@@ -0,0 +1,99 @@
+
+import os
+import re
+import json
+import hashlib
+from fileio import write_bytes_atomic
+
+INDEX_DIR = "index"
+PAGE_SIZE = 24
+RECENT_COUNT = 24
+
+
+def _minified(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _write_if_changed(path, data):
+    # Unchanged files keep their mtime, so deploys and caches skip them
+    content = _minified(data)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            if f.read() == content:
+                return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_bytes_atomic(path, content)
+    return True
+
+
+def season_filename(season):
+    """File-safe name for a season shard, distinct for distinct seasons
+
+    A season that is not already file-safe gets a hash of its exact text,
+    so "SS 25" and "SS_25", or "" and "none", never share a shard.
+    """
+    safe = re.sub(r"[^A-Za-z0-9_-]", "_", season or "none")
+    if safe != season:
+        safe += "-" + hashlib.blake2b(season.encode("utf-8"), digest_size=4).hexdigest()
+    return safe + ".json"
+
+
+def build_site_index(photos, data_dir, page_size=PAGE_SIZE, recent_count=RECENT_COUNT):
+    """Write the precomputed, minified views the site reads instead of photos.json
+
+    index/meta.json      counts, page count, seasons in catalogue order, tags
+    index/featured.json  featured records, newest udate first
+    index/recent.json    newest records by udate
+    index/pages/N.json   all records by udate, page_size per shard
+    index/seasons/*.json records per season, in catalogue order
+    index/tags.json      tag -> ids, newest udate first
+
+    Ordering matches the sorts in src/utils/photoUtils.ts. Returns the
+    number of files that changed.
+    """
+    index_dir = os.path.join(data_dir, INDEX_DIR)
+    # Stable like Array.prototype.sort, so udate ties keep catalogue order
+    by_udate = sorted(photos, key=lambda p: p.get("udate", ""), reverse=True)
+
+    seasons = {}
+    for photo in photos:
+        seasons.setdefault(photo.get("season", ""), []).append(photo)
+    tags = {}
+    for photo in by_udate:
+        for tag in photo.get("tags", []):
+            tags.setdefault(tag, []).append(photo["id"])
+
+    season_files = {season: season_filename(season) for season in seasons}
+    if len(set(season_files.values())) < len(season_files):
+        raise ValueError("Two seasons map to the same index file")
+
+    pages = [by_udate[i:i + page_size] for i in range(0, len(by_udate), page_size)]
+    files = {
+        "meta.json": {
+            "count": len(photos),
+            "pageSize": page_size,
+            "pages": len(pages),
+            "seasons": list(seasons),
+            "seasonFiles": season_files,
+            "tags": sorted(tags),
+        },
+        "featured.json": [p for p in by_udate if p.get("featured")],
+        "recent.json": by_udate[:recent_count],
+        "tags.json": tags,
+    }
+    for number, page in enumerate(pages, 1):
+        files[os.path.join("pages", f"{number}.json")] = page
+    for season, records in seasons.items():
+        files[os.path.join("seasons", season_files[season])] = records
+
+    changed = sum(_write_if_changed(os.path.join(index_dir, name), data) for name, data in files.items())
+
+    # Drop shards left over from a larger catalogue or a removed season
+    for subdir in ("pages", "seasons"):
+        directory = os.path.join(index_dir, subdir)
+        wanted = {os.path.basename(name) for name in files if name.startswith(subdir + os.sep)}
+        for name in os.listdir(directory) if os.path.isdir(directory) else []:
+            if name not in wanted:
+                os.remove(os.path.join(directory, name))
+                changed += 1
+    return changed
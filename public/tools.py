@@ -1,12 +1,35 @@
 
 import os
-import json
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from PIL import Image, ImageTk, ImageOps
+from PIL import ImageTk
+import time
 import threading
-from datetime import datetime
+import queue
 from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from imaging import read_header, read_headers
+from journal import JOURNAL_NAME, EditJournal
+from json_sorter import sort_directory
+from duplicates import find_duplicates
+from fileio import write_json_atomic
+from manifest import ConversionManifest
+from catalogue import open_catalogue, publish
+from metadata_store import MetadataStore
+from previews import PreviewCache
+from profiling import pipeline_report
+from progress import ProgressChannel, ProgressStats
+from virtual_table import VirtualTable
+from converter import (
+    BACKENDS, DEFAULT_WIDTHS, ConversionEngine, ConvertConfig, available_formats, list_images, parse_widths
+)
+
+# Images decoded ahead on each side of the one being edited
+PREVIEW_PREFETCH = 3
+PREVIEW_POLL_MS = 15
+SORTER_POLL_MS = 100
+LOG_DRAIN_MS = 100
+DEFAULT_PROCESSED_FOLDER = "./images/processed"
 
 class ImageToolsApp:
     def __init__(self, root):
@@ -38,6 +61,14 @@ class ImageToolsApp:
             'Tamron 18-270mm F/3.5-6.3 Di II VC PZD',
             'Sony E 18-50mm F4-5.6'
         ]
+        
+        self.preview_cache = PreviewCache(box=(400, 400))
+        self.log_channel = ProgressChannel()
+        self.header_pool = ThreadPoolExecutor(max_workers=1)
+        # Opened when the editor first needs it, creates ./data if missing
+        self.catalogue = None
+        # Unsaved editor edits of the open folder
+        self.journal = None
 
         self.create_main_menu()
     
@@ -69,6 +100,13 @@ class ImageToolsApp:
             command=self.create_json_sorter_ui
         )
         sorter_btn.pack(pady=10, ipadx=20, ipady=10)
+        
+        duplicates_btn = ttk.Button(
+            self.root,
+            text="Find Duplicate Images",
+            command=self.create_duplicate_finder_ui
+        )
+        duplicates_btn.pack(pady=10, ipadx=20, ipady=10)
     
     
     def create_json_sorter_ui(self):
@@ -108,20 +146,19 @@ class ImageToolsApp:
         results_frame = ttk.LabelFrame(self.root, text="Sorted Results", padding=10)
         results_frame.pack(fill="both", expand=True, padx=10, pady=10)
         
-        # Treeview for results
-        self.results_tree = ttk.Treeview(results_frame, columns=("date", "path", "items"), show="headings")
-        self.results_tree.heading("#1", text="Date")
-        self.results_tree.heading("#2", text="File Path")
-        self.results_tree.heading("#3", text="Items")
-        self.results_tree.column("#1", width=120)
-        self.results_tree.column("#2", width=350)
-        self.results_tree.column("#3", width=80)
-        self.results_tree.pack(fill="both", expand=True)
-        
-        # Scrollbar
-        scrollbar = ttk.Scrollbar(results_frame, orient="vertical", command=self.results_tree.yview)
-        scrollbar.pack(side="right", fill="y")
-        self.results_tree.configure(yscrollcommand=scrollbar.set)
+        # Filter over the result rows
+        filter_frame = ttk.Frame(results_frame)
+        filter_frame.pack(fill="x", pady=(0, 5))
+        ttk.Label(filter_frame, text="Filter:").pack(side="left")
+        self.results_filter_var = tk.StringVar()
+        self.results_filter_var.trace_add("write", lambda *args: self.filter_sort_results())
+        ttk.Entry(filter_frame, textvariable=self.results_filter_var, width=30).pack(side="left", padx=5)
+        self.results_count_label = ttk.Label(filter_frame, text="")
+        self.results_count_label.pack(side="right")
+        
+        # Only the visible rows exist as Treeview items, however many results there are
+        self.results_table = VirtualTable(results_frame, ("Date", "File Path", "Items"), widths=(120, 350, 80))
+        self.results_table.pack(fill="both", expand=True)
         
         # Sort button
         ttk.Button(
@@ -129,6 +166,34 @@ class ImageToolsApp:
             text="Process JSON Files",
             command=self.process_json_files
         ).pack(pady=10, ipadx=20, ipady=5)
+        ttk.Button(
+            self.root,
+            text="Sort Photo Catalogue",
+            command=self.sort_catalogue
+        ).pack(pady=(0, 10), ipadx=20, ipady=5)
+
+    def sort_catalogue(self):
+        """Order the photo catalogue by tdate and optionally save that order"""
+        if self.catalogue is None:
+            self.catalogue = open_catalogue()
+        
+        # An indexed query, nothing is parsed or sorted in Python
+        records = self.catalogue.listing(order="tdate", newest_first=self.sort_order.get() == "newest")
+        # Rows keep the query's order, so no column sort is applied on top
+        self.results_table.sort_by(None)
+        self.results_table.set_rows(
+            (record.get("tdate", ""), f"{record['id']}  {record.get('title', '')}", "") for record in records
+        )
+        self.update_results_count()
+        
+        if self.sort_action.get() != "save":
+            messagebox.showinfo("Complete", f"Found {len(records)} photos in the catalogue (preview only)")
+            return
+        if self.catalogue.reorder([record["id"] for record in records]):
+            publish(self.catalogue, assets_dir=self.processed_folder())
+            messagebox.showinfo("Complete", f"Sorted {len(records)} photos and exported the catalogue")
+        else:
+            messagebox.showinfo("Complete", f"The {len(records)} photos were already in this order")
 
     def process_json_files(self):
         """Sort JSON files by tdate and optionally save them"""
@@ -137,87 +202,178 @@ class ImageToolsApp:
             messagebox.showerror("Error", "Please select a valid directory")
             return
         
-        # Clear previous results
-        for item in self.results_tree.get_children():
-            self.results_tree.delete(item)
-        
-        files_data = []
-        all_items = []
-        
-        # First pass: collect all items from all files
-        for filename in os.listdir(directory):
-            if filename.endswith('.json'):
-                filepath = os.path.join(directory, filename)
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        
-                        if isinstance(data, list):
-                            for item in data:
-                                if 'tdate' in item:
-                                    try:
-                                        tdate = datetime.strptime(item['tdate'], '%Y-%m-%d')
-                                        all_items.append((tdate, item, filename))
-                                    except ValueError:
-                                        continue
-                        elif isinstance(data, dict) and 'tdate' in data:
-                            try:
-                                tdate = datetime.strptime(data['tdate'], '%Y-%m-%d')
-                                all_items.append((tdate, data, filename))
-                            except ValueError:
-                                continue
-                                
-                except (json.JSONDecodeError, UnicodeDecodeError) as e:
-                    self.results_tree.insert("", "end", values=("ERROR", f"{filename}: {str(e)}", ""))
-                    continue
-        
-        # Sort all items by date
-        reverse_sort = self.sort_order.get() == "newest"
-        all_items.sort(key=lambda x: x[0], reverse=reverse_sort)
-        
-        # Group items by original filename for display
-        file_groups = {}
-        for tdate, item, filename in all_items:
-            if filename not in file_groups:
-                file_groups[filename] = []
-            file_groups[filename].append((tdate, item))
-        
-        # Display results
-        for filename, items in file_groups.items():
-            filepath = os.path.join(directory, filename)
-            date_range = f"{items[0][0].strftime('%Y-%m-%d')} to {items[-1][0].strftime('%Y-%m-%d')}"
-            self.results_tree.insert("", "end", values=(date_range, filepath, len(items)))
-        
-        # Save sorted files if requested
-        if self.sort_action.get() == "save":
-            self.save_sorted_files(directory, all_items)
-            messagebox.showinfo("Complete", f"Sorted and saved {len(all_items)} items from {len(file_groups)} files")
+        # Clear previous results, newest or oldest date range first like the combined output
+        self.results_table.clear()
+        newest_first = self.sort_order.get() == "newest"
+        self.results_table.sort_by(0, reverse=newest_first)
+        self.update_results_count()
+        
+        # Parsing, sorting and writing happen off the Tk thread, rows arrive per file
+        save = self.sort_action.get() == "save"
+        results = queue.Queue()
+        
+        def work():
+            try:
+                result = sort_directory(
+                    directory,
+                    newest_first=newest_first,
+                    save=save,
+                    on_file=lambda summary: results.put(("file", summary))
+                )
+                results.put(("done", result))
+            except Exception as e:
+                results.put(("error", e))
+        
+        threading.Thread(target=work, daemon=True).start()
+        self.root.after(SORTER_POLL_MS, self.show_sort_results, results, save)
+    
+    def show_sort_results(self, results, save):
+        """Add rows for files sorted so far, and report once the sort is done"""
+        if not self.results_table.winfo_exists():
+            return
+        rows = []
+        finished = None
+        try:
+            while finished is None:
+                kind, payload = results.get_nowait()
+                if kind == "file":
+                    if "error" in payload:
+                        rows.append(("ERROR", f"{payload['file']}: {payload['error']}", ""))
+                    elif payload["count"]:
+                        rows.append((f"{payload['first']} to {payload['last']}", payload["path"], payload["count"]))
+                else:
+                    finished = (kind, payload)
+        except queue.Empty:
+            pass
+        
+        # One batch per poll, the table redraws only its visible window
+        if rows:
+            self.results_table.append_rows(rows)
+            self.update_results_count()
+        if finished is None:
+            self.root.after(SORTER_POLL_MS, self.show_sort_results, results, save)
+            return
+        
+        kind, result = finished
+        if kind == "error":
+            messagebox.showerror("Error", f"Failed to sort JSON files: {str(result)}")
+            return
+        file_count = len(result["files"])
+        if save:
+            messagebox.showinfo("Complete", f"Sorted and saved {result['total']} items from {file_count} files")
         else:
-            messagebox.showinfo("Complete", f"Found {len(all_items)} items in {len(file_groups)} files (preview only)")
-
-    def save_sorted_files(self, directory, sorted_items):
-        """Save sorted items back to files"""
-        # Create output directory if it doesn't exist
-        output_dir = os.path.join(directory, "sorted")
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Group items by original filename
-        file_groups = {}
-        for tdate, item, filename in sorted_items:
-            if filename not in file_groups:
-                file_groups[filename] = []
-            file_groups[filename].append(item)
-        
-        # Save each file with sorted items
-        for filename, items in file_groups.items():
-            output_path = os.path.join(output_dir, filename)
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(items, f, ensure_ascii=False, indent=2)
-        
-        # Create a combined file with all items
-        combined_path = os.path.join(output_dir, "combined_sorted.json")
-        with open(combined_path, 'w', encoding='utf-8') as f:
-            json.dump([item for _, item, _ in sorted_items], f, ensure_ascii=False, indent=2)
+            messagebox.showinfo("Complete", f"Found {result['total']} items in {file_count} files (preview only)")
+    
+    def filter_sort_results(self):
+        """Apply the filter text to the result rows"""
+        self.results_table.filter(self.results_filter_var.get())
+        self.update_results_count()
+    
+    def update_results_count(self):
+        table = self.results_table
+        self.results_count_label.config(text=f"{table.shown} of {len(table.rows)} rows")
+    
+    def create_duplicate_finder_ui(self):
+        """Create UI for the duplicate image finder"""
+        self.clear_window()
+        
+        # Back button
+        back_btn = ttk.Button(self.root, text="← Back", command=self.create_main_menu)
+        back_btn.pack(anchor="nw", padx=10, pady=10)
+        
+        title_label = ttk.Label(self.root, text="Duplicate Finder", font=("Helvetica", 14))
+        title_label.pack(pady=10)
+        
+        # Directory selection
+        ttk.Label(self.root, text="Image folder:").pack(pady=(10, 0))
+        self.duplicates_dir_var = tk.StringVar(value=os.path.abspath("./images/todo"))
+        dir_frame = ttk.Frame(self.root)
+        dir_frame.pack()
+        ttk.Entry(dir_frame, textvariable=self.duplicates_dir_var, width=50).pack(side="left")
+        ttk.Button(dir_frame, text="Browse", command=self.browse_duplicates_dir).pack(side="left", padx=5)
+        
+        # Hash options
+        options_frame = ttk.Frame(self.root)
+        options_frame.pack(pady=10)
+        
+        ttk.Label(options_frame, text="Hash:").grid(row=0, column=0, sticky="w")
+        self.hash_method = tk.StringVar(value="dhash")
+        ttk.Radiobutton(options_frame, text="dHash", variable=self.hash_method, value="dhash").grid(row=0, column=1, sticky="w")
+        ttk.Radiobutton(options_frame, text="pHash", variable=self.hash_method, value="phash").grid(row=0, column=2, sticky="w")
+        
+        ttk.Label(options_frame, text="Max distance (bits):").grid(row=1, column=0, sticky="w")
+        self.hash_threshold = tk.IntVar(value=6)
+        ttk.Spinbox(options_frame, from_=0, to=32, textvariable=self.hash_threshold, width=5).grid(row=1, column=1, sticky="w")
+        
+        # Results frame
+        results_frame = ttk.LabelFrame(self.root, text="Duplicate Groups", padding=10)
+        results_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        self.duplicates_tree = ttk.Treeview(results_frame, columns=("distance",), show="tree headings")
+        self.duplicates_tree.heading("#0", text="File")
+        self.duplicates_tree.heading("#1", text="Distance")
+        self.duplicates_tree.column("#0", width=400)
+        self.duplicates_tree.column("#1", width=80)
+        self.duplicates_tree.pack(side="left", fill="both", expand=True)
+        
+        scrollbar = ttk.Scrollbar(results_frame, orient="vertical", command=self.duplicates_tree.yview)
+        scrollbar.pack(side="right", fill="y")
+        self.duplicates_tree.configure(yscrollcommand=scrollbar.set)
+        
+        ttk.Button(
+            self.root,
+            text="Find Duplicates",
+            command=self.find_duplicate_images
+        ).pack(pady=10, ipadx=20, ipady=5)
+    
+    def find_duplicate_images(self):
+        """Hash the folder in the background and show duplicate groups"""
+        folder = self.duplicates_dir_var.get()
+        if not folder or not os.path.isdir(folder):
+            messagebox.showerror("Error", "Please select a valid directory")
+            return
+        try:
+            threshold = int(self.hash_threshold.get())
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Error", "Distance must be a number")
+            return
+        
+        self.duplicates_tree.delete(*self.duplicates_tree.get_children())
+        method = self.hash_method.get()
+        results = queue.Queue()
+        
+        def work():
+            try:
+                results.put(find_duplicates(folder, threshold=threshold, method=method))
+            except Exception as e:
+                results.put(e)
+        
+        threading.Thread(target=work, daemon=True).start()
+        self.root.after(SORTER_POLL_MS, self.show_duplicates, results)
+    
+    def show_duplicates(self, results):
+        """Fill the duplicates tree once hashing is done"""
+        try:
+            groups = results.get_nowait()
+        except queue.Empty:
+            self.root.after(SORTER_POLL_MS, self.show_duplicates, results)
+            return
+        if not self.duplicates_tree.winfo_exists():
+            return
+        if isinstance(groups, Exception):
+            messagebox.showerror("Error", f"Failed to find duplicates: {str(groups)}")
+            return
+        
+        for i, group in enumerate(groups, 1):
+            parent = self.duplicates_tree.insert("", "end", text=f"Group {i} ({len(group)} files)", open=True)
+            for filename, distance in group:
+                self.duplicates_tree.insert(parent, "end", text=filename, values=(distance,))
+        messagebox.showinfo("Complete", f"Found {len(groups)} duplicate groups")
+    
+    def browse_duplicates_dir(self):
+        folder = filedialog.askdirectory(initialdir=self.duplicates_dir_var.get())
+        if folder:
+            self.duplicates_dir_var.set(folder)
     
     def browse_json_dir(self):
         """Browse for JSON directory"""
@@ -246,7 +402,7 @@ class ImageToolsApp:
         
         # Output folder
         ttk.Label(self.root, text="Output Folder:").pack(pady=(10, 0))
-        self.output_folder = tk.StringVar(value=os.path.abspath("./images/processed"))
+        self.output_folder = tk.StringVar(value=os.path.abspath(DEFAULT_PROCESSED_FOLDER))
         output_frame = ttk.Frame(self.root)
         output_frame.pack()
         ttk.Entry(output_frame, textvariable=self.output_folder, width=50).pack(side="left")
@@ -259,11 +415,67 @@ class ImageToolsApp:
         self.webp_quality = tk.IntVar(value=85)
         ttk.Scale(self.root, from_=1, to=100, variable=self.webp_quality, orient="horizontal").pack()
         
+        # Worker pool settings
+        pool_frame = ttk.Frame(self.root)
+        pool_frame.pack(pady=5)
+        ttk.Label(pool_frame, text="Backend:").pack(side="left")
+        self.backend_var = tk.StringVar(value="process")
+        ttk.Combobox(pool_frame, textvariable=self.backend_var, values=BACKENDS, width=10, state="readonly").pack(side="left", padx=5)
+        ttk.Label(pool_frame, text="Workers:").pack(side="left")
+        self.worker_count = tk.IntVar(value=os.cpu_count() or 1)
+        ttk.Spinbox(pool_frame, from_=1, to=256, textvariable=self.worker_count, width=5).pack(side="left", padx=5)
+        ttk.Label(pool_frame, text="Memory budget (MP, 0 = off):").pack(side="left")
+        self.pixel_budget_var = tk.IntVar(value=0)
+        ttk.Entry(pool_frame, textvariable=self.pixel_budget_var, width=6).pack(side="left", padx=5)
+        
+        # Responsive sizes
+        sizes_frame = ttk.Frame(self.root)
+        sizes_frame.pack(pady=5)
+        ttk.Label(sizes_frame, text="Widths:").pack(side="left")
+        self.widths_var = tk.StringVar(value=",".join(str(w) for w in DEFAULT_WIDTHS))
+        ttk.Entry(sizes_frame, textvariable=self.widths_var, width=25).pack(side="left", padx=5)
+        ttk.Label(sizes_frame, text="Max width (0 = original):").pack(side="left")
+        self.max_width_var = tk.IntVar(value=0)
+        ttk.Entry(sizes_frame, textvariable=self.max_width_var, width=6).pack(side="left", padx=5)
+        self.avif_var = tk.BooleanVar(value=False)
+        avif_check = ttk.Checkbutton(sizes_frame, text="Also AVIF", variable=self.avif_var)
+        avif_check.pack(side="left", padx=5)
+        if "avif" not in available_formats():
+            avif_check.state(["disabled"])
+        
+        target_frame = ttk.Frame(self.root)
+        target_frame.pack(pady=5)
+        ttk.Label(target_frame, text="Target size KB (0 = off):").pack(side="left")
+        self.target_kb_var = tk.IntVar(value=0)
+        ttk.Entry(target_frame, textvariable=self.target_kb_var, width=6).pack(side="left", padx=5)
+        ttk.Label(target_frame, text="Target SSIM (0 = off):").pack(side="left")
+        self.target_ssim_var = tk.DoubleVar(value=0.0)
+        ttk.Entry(target_frame, textvariable=self.target_ssim_var, width=6).pack(side="left", padx=5)
+        
+        self.incremental_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(self.root, text="Skip unchanged images", variable=self.incremental_var).pack()
+        self.keep_smaller_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.root, text="Try lossy and lossless WEBP, keep the smaller", variable=self.keep_smaller_var
+        ).pack()
+        self.hashed_names_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self.root, text="Content-hashed file names (immutable caching)", variable=self.hashed_names_var
+        ).pack()
+        
         # Log window
         ttk.Label(self.root, text="Conversion Log", font=("Helvetica", 12)).pack(pady=(20, 5))
         self.log_text = tk.Text(self.root, height=10, state="disabled")
         self.log_text.pack(fill="both", expand=True, padx=10, pady=(0, 10))
         
+        # Progress bar with throughput and ETA
+        self.progress_bar = ttk.Progressbar(self.root, orient="horizontal", mode="determinate")
+        self.progress_bar.pack(fill="x", padx=10)
+        self.progress_label = ttk.Label(self.root, text="")
+        self.progress_label.pack()
+        self.progress_stats = None
+        self.root.after(LOG_DRAIN_MS, self.drain_log, self.log_text)
+        
         # Convert button
         ttk.Button(
             self.root, 
@@ -372,13 +584,17 @@ class ImageToolsApp:
         self.next_btn = ttk.Button(self.control_frame, text="Next", command=self.next_image)
         self.next_btn.pack(side="left", padx=5)
         
+        self.exif_btn = ttk.Button(self.control_frame, text="Fill All from EXIF", command=self.fill_all_from_exif)
+        self.exif_btn.pack(side="left", padx=5)
+        
         self.save_btn = ttk.Button(self.control_frame, text="Save JSON", command=self.save_metadata)
         self.save_btn.pack(side="right", padx=5)
         
         # Initialize
         self.current_image_index = 0
         self.image_files = []
-        self.metadata = []
+        self.metadata = {}
+        self.metadata_store = MetadataStore(os.path.join(self.folder_var.get(), "output.json"))
         
         # Configure grid weights
         self.root.columnconfigure(0, weight=1)
@@ -420,6 +636,20 @@ class ImageToolsApp:
             return
         
         self.current_image_index = 0
+        self.metadata_store = MetadataStore(os.path.join(folder, "output.json"))
+        
+        # Edits not yet saved when the folder was last open come back as session edits
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = EditJournal(os.path.join(folder, JOURNAL_NAME))
+        self.metadata = self.journal.replay()
+        if self.metadata:
+            messagebox.showinfo("Info", f"Restored {len(self.metadata)} unsaved edits from the last session")
+        self.preview_cache.clear()
+        
+        # Read every EXIF header in the background while the first image opens
+        paths = [os.path.join(folder, f) for f in self.image_files]
+        self.header_future = self.header_pool.submit(read_headers, paths)
         self.load_current_image()
     
     def load_current_image(self):
@@ -449,60 +679,150 @@ class ImageToolsApp:
         
         self.featured_var.set(False)
         
-        # Load image preview with correct orientation
+        # EXIF defaults from the header scan, existing metadata overrides them
+        header = self.image_header(filepath)
+        self.dimensions = header.get("dimension", "0x0")
+        if header.get("camera"):
+            self.set_combo_value(self.camera_combo, self.camera_var, header["camera"])
+        if header.get("lens"):
+            self.set_combo_value(self.lens_combo, self.lens_var, header["lens"])
+        if header.get("tdate"):
+            self.tdate_entry.delete(0, tk.END)
+            self.tdate_entry.insert(0, header["tdate"])
+        
+        # Try to load existing metadata
+        self.load_existing_metadata(file_id)
+        
+        # Preview is decoded in the background, neighbours are prefetched
+        future = self.preview_cache.request(filepath)
+        first = max(0, self.current_image_index - PREVIEW_PREFETCH)
+        last = min(len(self.image_files), self.current_image_index + PREVIEW_PREFETCH + 1)
+        self.preview_cache.prefetch(
+            os.path.join(folder, f) for f in self.image_files[first:last]
+        )
+        self.show_preview(filepath, future)
+    
+    def image_header(self, filepath):
+        """EXIF header of an image, from the folder scan when it is ready"""
+        if self.header_future.done():
+            header = self.header_future.result().get(filepath)
+            if header is not None:
+                return header
+        try:
+            return read_header(filepath)
+        except Exception as e:
+            return {"error": str(e)}
+    
+    def set_combo_value(self, combo, variable, value):
+        """Select a value, adding it to the dropdown if it is new"""
+        values = list(combo.cget("values"))
+        if value not in values:
+            combo.config(values=values + [value])
+        variable.set(value)
+    
+    def fill_all_from_exif(self):
+        """Create records from EXIF for every image that has none yet"""
+        if not self.image_files:
+            return
+        self.save_current_metadata()
+        self.exif_btn.config(state="disabled")
+        self.apply_exif_headers(self.header_future)
+    
+    def apply_exif_headers(self, future):
+        """Fill records once the folder's header scan is done, polled so Tk stays responsive"""
+        if not self.exif_btn.winfo_exists():
+            return
+        if future is not self.header_future:
+            # Another folder was opened meanwhile, its records start from scratch
+            self.exif_btn.config(state="normal")
+            return
+        if not future.done():
+            self.root.after(SORTER_POLL_MS, self.apply_exif_headers, future)
+            return
+        self.exif_btn.config(state="normal")
+        
+        folder = self.folder_var.get()
+        headers = future.result()
+        today = datetime.now().strftime("%Y-%m-%d")
+        added = []
+        for filename in self.image_files:
+            file_id = os.path.splitext(filename)[0]
+            if file_id in self.metadata or self.stored_record(file_id):
+                continue
+            header = headers.get(os.path.join(folder, filename), {})
+            self.metadata[file_id] = {
+                "id": file_id,
+                "title": "",
+                "description": "",
+                "season": "",
+                "tags": [],
+                "camera": header.get("camera") or self.camera_options[0],
+                "lens": header.get("lens") or self.lens_options[0],
+                "dimension": header.get("dimension", "0x0"),
+                "udate": today,
+                "tdate": header.get("tdate") or today,
+                "featured": False
+            }
+            added.append(self.metadata[file_id])
+        # One append, so one fsync for the whole folder
+        self.journal.append(*added)
+        messagebox.showinfo("EXIF", f"Created {len(added)} records from EXIF")
+    
+    def show_preview(self, filepath, future):
+        """Show a preview once its background decode is done"""
+        if not self.image_label.winfo_exists() or not self.image_files:
+            return
+        current = os.path.join(self.folder_var.get(), self.image_files[self.current_image_index])
+        if filepath != current:
+            # User already moved on to another image
+            return
+        if future.cancelled():
+            future = self.preview_cache.request(filepath)
+        if not future.done():
+            self.image_label.config(image="", text="Loading...")
+            self.root.after(PREVIEW_POLL_MS, self.show_preview, filepath, future)
+            return
+        
         try:
-            with Image.open(filepath) as img:
-                img = ImageOps.exif_transpose(img)
-                self.original_width, self.original_height = img.size
-                self.dimensions = f"{self.original_width}x{self.original_height}"
-                
-                img.thumbnail((400, 400), Image.Resampling.LANCZOS)
-                photo = ImageTk.PhotoImage(img)
-                
-                self.image_label.config(image=photo)
-                self.image_label.image = photo
-                
-                # Try to load existing metadata
-                self.load_existing_metadata(file_id)
+            img, _ = future.result()
+            photo = ImageTk.PhotoImage(img)
+            self.image_label.config(image=photo, text="")
+            self.image_label.image = photo
         except Exception as e:
-            self.image_label.config(text=f"Cannot load image: {str(e)}")
-            self.dimensions = "0x0"
+            self.image_label.config(image="", text=f"Cannot load image: {str(e)}")
 
+    def stored_record(self, file_id):
+        """Saved record for a photo, from the catalogue or the folder's output.json"""
+        if self.catalogue is None:
+            self.catalogue = open_catalogue()
+        return self.catalogue.get(file_id) or self.metadata_store.get(file_id)
+    
     def load_existing_metadata(self, file_id):
-        """Try to load existing metadata from output.json"""
-        output_path = os.path.join(self.folder_var.get(), "output.json")
-        if os.path.exists(output_path):
-            try:
-                with open(output_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    for item in data:
-                        if item["id"] == file_id:
-                            self.title_entry.insert(0, item.get("title", ""))
-                            self.description_text.insert("1.0", item.get("description", ""))
-                            self.season_entry.insert(0, item.get("season", ""))
-                            
-                            # Set categories (indices)
-                            cat_indices = []
-                            for cat in item.get("tags", []):
-                                for i, key in enumerate(self.categories.keys()):
-                                    if key == cat:
-                                        cat_indices.append(str(i))
-                            self.categories_entry.insert(0, ",".join(cat_indices))
-                            
-                            # Camera and lens
-                            self.camera_var.set(item.get("camera", self.camera_options[0]))
-                            self.lens_var.set(item.get("lens", self.lens_options[0]))
-                            
-                            # Dates
-                            self.udate_entry.delete(0, tk.END)
-                            self.udate_entry.insert(0, item.get("udate", datetime.now().strftime("%Y-%m-%d")))
-                            self.tdate_entry.delete(0, tk.END)
-                            self.tdate_entry.insert(0, item.get("tdate", datetime.now().strftime("%Y-%m-%d")))
-                            
-                            self.featured_var.set(item.get("featured", False))
-                            break
-            except:
-                pass
+        """Fill the form from this session's edits or from the saved record"""
+        item = self.metadata.get(file_id) or self.stored_record(file_id)
+        if not item:
+            return
+        
+        self.title_entry.insert(0, item.get("title", ""))
+        self.description_text.insert("1.0", item.get("description", ""))
+        self.season_entry.insert(0, item.get("season", ""))
+        
+        # Set categories (indices)
+        category_keys = list(self.categories.keys())
+        cat_indices = [str(category_keys.index(cat)) for cat in item.get("tags", []) if cat in self.categories]
+        self.categories_entry.insert(0, ",".join(cat_indices))
+        
+        # Camera and lens
+        self.camera_var.set(item.get("camera", self.camera_options[0]))
+        self.lens_var.set(item.get("lens", self.lens_options[0]))
+        
+        # Dates
+        self.udate_entry.delete(0, tk.END)
+        self.udate_entry.insert(0, item.get("udate", datetime.now().strftime("%Y-%m-%d")))
+        self.tdate_entry.delete(0, tk.END)
+        self.tdate_entry.insert(0, item.get("tdate", datetime.now().strftime("%Y-%m-%d")))
+        
+        self.featured_var.set(item.get("featured", False))
 
     def prev_image(self):
         if self.current_image_index > 0:
@@ -562,11 +882,10 @@ class ImageToolsApp:
             "featured": self.featured_var.get()
         }
         
-        # Update or add metadata
-        if self.current_image_index < len(self.metadata):
-            self.metadata[self.current_image_index] = item
-        else:
-            self.metadata.append(item)
+        # Update or add metadata, journaling only real changes
+        if self.metadata.get(file_id) != item:
+            self.metadata[file_id] = item
+            self.journal.append(item)
     
     def save_metadata(self):
         """Save all metadata to JSON files"""
@@ -578,107 +897,195 @@ class ImageToolsApp:
         
         folder = self.folder_var.get()
         output_path = os.path.join(folder, "output.json")
-        portfolio_path = "./data/portfolio.json"
+        
+        # Edited records in folder order, over the stored ones so keys the
+        # form does not own (placeholder, color, assets) survive
+        file_ids = [os.path.splitext(f)[0] for f in self.image_files]
+        items = [
+            {**(self.stored_record(file_id) or {}), **self.metadata[file_id]}
+            for file_id in file_ids if file_id in self.metadata
+        ]
+        
+        # Placeholders and current asset names from the converter's manifest
+        assets = ConversionManifest(self.processed_folder()).photo_assets()
+        for item in items:
+            item.update(assets.get(item["id"], {}))
         
         try:
             # Save to output.json in working folder
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(self.metadata, f, ensure_ascii=False, indent=4)
+            write_json_atomic(output_path, items, indent=4)
             
-            # Also add to portfolio.json
-            portfolio_data = []
-            if os.path.exists(portfolio_path):
-                with open(portfolio_path, "r", encoding="utf-8") as f:
-                    try:
-                        portfolio_data = json.load(f)
-                    except:
-                        portfolio_data = []
+            # Changed records go to the front of the catalogue, newest first
+            if self.catalogue is None:
+                self.catalogue = open_catalogue()
+            changed = self.catalogue.upsert(items)
             
-            # Add new entries to beginning
-            for item in reversed(self.metadata):
-                # Remove existing entry if it exists
-                portfolio_data = [x for x in portfolio_data if x["id"] != item["id"]]
-                portfolio_data.insert(0, item)
+            # Every record takes its current asset names before the exports,
+            # which with the site index are rewritten only after a real change
+            publish(self.catalogue, assets_dir=self.processed_folder())
             
-            os.makedirs(os.path.dirname(portfolio_path), exist_ok=True)
-            with open(portfolio_path, "w", encoding="utf-8") as f:
-                json.dump(portfolio_data, f, ensure_ascii=False, indent=4)
+            # Everything journaled is now in the metadata files
+            self.journal.compact()
             
-            messagebox.showinfo("Success", "Metadata saved successfully")
+            messagebox.showinfo("Success", f"Metadata saved successfully ({changed} changed)")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save metadata: {str(e)}")
     
-    def convert_to_webp(self, input_path, output_dir):
-        """Convert image to WEBP with proper orientation"""
-        filename = os.path.basename(input_path)
-        name_without_ext = os.path.splitext(filename)[0]
-        output_path = os.path.join(output_dir, f"{name_without_ext}.webp")
-        
-        try:
-            # Load image with correct orientation
-            img = Image.open(input_path)
-            img = ImageOps.exif_transpose(img)
-            
-            img.save(
-                output_path,
-                format="WEBP",
-                quality=self.webp_quality.get()
-            )
-            self.log(f"Converted: {filename} -> {name_without_ext}.webp")
-            return True
-        except Exception as e:
-            self.log(f"Error converting {filename}: {str(e)}")
-            return False
-    
-    def process_image(self, filename):
-        """Process a single image"""
-        input_path = os.path.join(self.input_folder.get(), filename)
-        return self.convert_to_webp(input_path, self.output_folder.get())
+    def processed_folder(self):
+        """Converter output folder, as last set in the converter UI"""
+        if hasattr(self, "output_folder"):
+            return self.output_folder.get()
+        return os.path.abspath(DEFAULT_PROCESSED_FOLDER)
     
-    def convert_images(self):
+    def convert_images(self, input_folder, config, backend, workers, incremental=False, pixel_budget=None):
         """Main conversion function"""
-        input_folder = self.input_folder.get()
-        output_folder = self.output_folder.get()
-        
         if not os.path.isdir(input_folder):
             self.log("Error: Input folder does not exist")
             return
         
-        os.makedirs(output_folder, exist_ok=True)
-        
         self.log("Starting conversion...")
         
         # Get list of images
-        image_files = [
-            f for f in os.listdir(input_folder) 
-            if f.lower().endswith(('.jpg', '.jpeg', '.png'))
-        ]
+        image_files = list_images(input_folder)
         
         if not image_files:
             self.log("No images found for conversion")
             return
         
-        # Process in parallel with 4 threads
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            results = list(executor.map(self.process_image, image_files))
+        try:
+            engine = ConversionEngine(
+                config,
+                backend=backend,
+                workers=workers,
+                incremental=incremental,
+                pixel_budget=pixel_budget
+            )
+        except ValueError as e:
+            self.log(f"Error: {str(e)}")
+            return
+        self.log(f"Using {engine.workers} {backend} workers")
+        self.log_channel.start(len(image_files))
+        started = time.time()
+        results = engine.run(
+            [os.path.join(input_folder, f) for f in image_files],
+            on_result=self.log_conversion_result
+        )
+        report = pipeline_report(results, engine.workers, started, time.time() - started)
+        if report["files"]:
+            # Where the time went, largest total first
+            stages = sorted(report["stages"].items(), key=lambda item: item[1]["total_s"], reverse=True)
+            self.log("Stage p50/p95: " + ", ".join(
+                f"{name} {stats['p50_ms']:.0f}/{stats['p95_ms']:.0f} ms" for name, stats in stages[:4]
+            ))
+            self.log(
+                f"Workers busy {report['workers']['busy_pct']}%, "
+                f"{report['mb_in_per_s']} MB/s in, {report['mb_out_per_s']} MB/s out"
+            )
         
-        success_count = sum(results)
+        success_count = sum(1 for r in results if r["ok"])
+        skipped_count = sum(1 for r in results if r.get("skipped"))
+        if skipped_count:
+            self.log(f"Skipped {skipped_count} unchanged or duplicate images")
         self.log(f"Conversion completed! Successful: {success_count}/{len(image_files)}")
-        messagebox.showinfo("Complete", f"Conversion completed!\nSuccessful: {success_count}/{len(image_files)}")
+        self.log_channel.finish(f"Conversion completed!\nSuccessful: {success_count}/{len(image_files)}")
+    
+    def log_conversion_result(self, result):
+        """Log the outcome of one converted file"""
+        self.log_channel.advance()
+        if result.get("skipped"):
+            if result.get("reason"):
+                self.log(f"Skipped {result['file']}: {result['reason']}")
+            return
+        if result["ok"]:
+            route = result["route"] if result["quality"] is None else f"{result['route']}, q={result['quality']}"
+            self.log(
+                f"Converted ({route}): {result['file']} -> "
+                f"{os.path.basename(result['output'])} ({len(result['variants'])} files)"
+            )
+        else:
+            self.log(f"Error converting {result['file']}: {result['error']}")
     
     def start_conversion_thread(self):
         """Start conversion in a separate thread"""
-        thread = threading.Thread(target=self.convert_images)
+        # Read Tk variables here, worker threads and processes only see the config
+        try:
+            widths = parse_widths(self.widths_var.get())
+            max_width = max(0, int(self.max_width_var.get()))
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Error", "Widths must be positive numbers separated by commas")
+            return
+        try:
+            target_kb = max(0, int(self.target_kb_var.get()))
+            target_ssim = float(self.target_ssim_var.get())
+        except (tk.TclError, ValueError):
+            messagebox.showerror("Error", "Targets must be numbers")
+            return
+        formats = ("webp", "avif") if self.avif_var.get() else ("webp",)
+        config = ConvertConfig(
+            output_dir=self.output_folder.get(),
+            quality=int(self.webp_quality.get()),
+            widths=widths,
+            max_width=max_width,
+            formats=formats,
+            keep_smaller=self.keep_smaller_var.get(),
+            target_kb=target_kb,
+            target_ssim=target_ssim,
+            hashed_names=self.hashed_names_var.get()
+        )
+        try:
+            workers = int(self.worker_count.get())
+        except (tk.TclError, ValueError):
+            workers = None
+        try:
+            pixel_budget = max(0, int(self.pixel_budget_var.get())) * 1_000_000 or None
+        except (tk.TclError, ValueError):
+            pixel_budget = None
+        thread = threading.Thread(
+            target=self.convert_images,
+            args=(
+                self.input_folder.get(), config, self.backend_var.get(), workers, self.incremental_var.get(),
+                pixel_budget
+            )
+        )
         thread.daemon = True
         thread.start()
     
     def log(self, message):
-        """Log to text window"""
-        self.log_text.config(state="normal")
-        self.log_text.insert(tk.END, message + "\n")
-        self.log_text.see(tk.END)
-        self.log_text.config(state="disabled")
-        self.root.update_idletasks()
+        """Queue a line for the log window, safe from any thread"""
+        self.log_channel.log(message)
+    
+    def drain_log(self, log_text):
+        """Apply queued log lines and progress on the Tk thread in one batch"""
+        if log_text is not self.log_text or not log_text.winfo_exists():
+            # Converter window was closed or rebuilt
+            return
+        
+        lines = []
+        finished = None
+        for event in self.log_channel.drain():
+            kind = event[0]
+            if kind == "log":
+                lines.append(event[1])
+            elif kind == "start":
+                self.progress_stats = ProgressStats(event[1])
+                self.progress_bar.config(maximum=max(1, event[1]), value=0)
+            elif kind == "advance" and self.progress_stats:
+                self.progress_stats.advance(event[1])
+            elif kind == "finish":
+                finished = event[1]
+        
+        if lines:
+            log_text.config(state="normal")
+            log_text.insert(tk.END, "\n".join(lines) + "\n")
+            log_text.see(tk.END)
+            log_text.config(state="disabled")
+        if self.progress_stats:
+            self.progress_bar.config(value=self.progress_stats.done)
+            self.progress_label.config(text=self.progress_stats.describe())
+        
+        self.root.after(LOG_DRAIN_MS, self.drain_log, log_text)
+        if finished:
+            messagebox.showinfo("Complete", finished)
     
     def clear_window(self):
         """Clear all widgets"""
@@ -0,0 +1,172 @@
+
+import heapq
+from tkinter import ttk
+
+WHEEL_ROWS = 3
+DEFAULT_ROW_HEIGHT = 20
+
+
+def _sort_key(value):
+    # Numbers sort before text, so a mixed column never compares int with str
+    if isinstance(value, (int, float)):
+        return (0, value, "")
+    return (1, 0, str(value))
+
+
+class VirtualTable(ttk.Frame):
+    """Treeview showing a window onto a row list of any length
+
+    Rows live in a plain list and the Treeview only holds the items that
+    fit on screen; scrolling rewrites their values instead of inserting or
+    deleting. Sorting and filtering reorder a list of row indices, never
+    the widget, so they cost the same whatever has been shown before.
+    """
+
+    def __init__(self, master, columns, widths=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.columns = list(columns)
+        self.rows = []
+        self._search = []
+        self._view = []
+        self._items = []
+        self._top = 0
+        self._filter = ""
+        self._sort_column = None
+        self._sort_reverse = False
+
+        keys = [f"c{i}" for i in range(len(self.columns))]
+        self.tree = ttk.Treeview(self, columns=keys, show="headings", selectmode="browse")
+        for i, (key, heading) in enumerate(zip(keys, self.columns)):
+            self.tree.heading(key, text=heading, command=lambda i=i: self.sort_by(i))
+            if widths:
+                self.tree.column(key, width=widths[i])
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.tree.bind("<Configure>", lambda event: self.render())
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(sequence, self._on_wheel)
+
+    @property
+    def shown(self):
+        """Rows left after filtering"""
+        return len(self._view)
+
+    def clear(self):
+        self.rows = []
+        self._search = []
+        self._view = []
+        self._top = 0
+        self.render()
+
+    def set_rows(self, rows):
+        self.rows = []
+        self._search = []
+        self._view = []
+        self._top = 0
+        self.append_rows(rows)
+
+    def append_rows(self, rows):
+        """Add rows, e.g. while results are still arriving"""
+        start = len(self.rows)
+        self.rows.extend(tuple(row) for row in rows)
+        self._search.extend(" ".join(str(v) for v in row).lower() for row in self.rows[start:])
+        # Only the new rows are filtered and sorted, then merged into the
+        # view, which keeps the order a full stable sort would give
+        new = self._ordered(range(start, len(self.rows)))
+        if self._sort_column is None:
+            self._view.extend(new)
+        else:
+            self._view = list(heapq.merge(self._view, new, key=self._key, reverse=self._sort_reverse))
+        self.render()
+
+    def filter(self, text):
+        """Show only rows containing text in any column, ignoring case"""
+        self._filter = text.strip().lower()
+        self._top = 0
+        self._rebuild_view()
+        self.render()
+
+    def sort_by(self, column, reverse=None):
+        """Sort on a column, a repeated heading click flips the direction
+
+        None keeps the order the rows were added in.
+        """
+        if reverse is None:
+            reverse = not self._sort_reverse if column == self._sort_column else False
+        self._sort_column = column
+        self._sort_reverse = reverse
+        for i, heading in enumerate(self.columns):
+            arrow = (" ▼" if reverse else " ▲") if i == column else ""
+            self.tree.heading(f"c{i}", text=heading + arrow)
+        self._rebuild_view()
+        self.render()
+
+    def _key(self, index):
+        return _sort_key(self.rows[index][self._sort_column])
+
+    def _ordered(self, indices):
+        if self._filter:
+            indices = [i for i in indices if self._filter in self._search[i]]
+        if self._sort_column is not None:
+            indices = sorted(indices, key=self._key, reverse=self._sort_reverse)
+        return list(indices)
+
+    def _rebuild_view(self):
+        self._view = self._ordered(range(len(self.rows)))
+
+    def _geometry(self):
+        # Heading and row height as drawn, known once an item is on screen
+        if self._items:
+            box = self.tree.bbox(self._items[0])
+            if box:
+                return box[1], box[3]
+        height = ttk.Style().lookup("Treeview", "rowheight")
+        height = int(height) if height else DEFAULT_ROW_HEIGHT
+        return height + 4, height
+
+    def _visible_count(self):
+        heading, row_height = self._geometry()
+        return max(1, (self.tree.winfo_height() - heading) // row_height)
+
+    def render(self):
+        """Show the rows of the current window"""
+        count = self._visible_count()
+        total = len(self._view)
+        self._top = max(0, min(self._top, total - count))
+        window = self._view[self._top:self._top + count]
+
+        while len(self._items) < len(window):
+            self._items.append(self.tree.insert("", "end"))
+        while len(self._items) > len(window):
+            self.tree.delete(self._items.pop())
+        for item, index in zip(self._items, window):
+            self.tree.item(item, values=self.rows[index])
+
+        if total:
+            self.scrollbar.set(self._top / total, min(1.0, (self._top + count) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def yview(self, *args):
+        """Scrollbar protocol: moveto a fraction, or scroll by units or pages"""
+        if not args:
+            return
+        count = self._visible_count()
+        if args[0] == "moveto":
+            self._top = int(float(args[1]) * len(self._view))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self._top += step * count if args[2] == "pages" else step
+        self.render()
+
+    def _on_wheel(self, event):
+        if event.num == 4:
+            step = -WHEEL_ROWS
+        elif event.num == 5:
+            step = WHEEL_ROWS
+        else:
+            step = -WHEEL_ROWS if event.delta > 0 else WHEEL_ROWS
+        self.yview("scroll", step, "units")
+        return "break"
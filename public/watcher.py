@@ -0,0 +1,142 @@
+
+import os
+import json
+import asyncio
+from converter import IMAGE_EXTENSIONS
+from fileio import write_json_atomic
+
+QUEUE_NAME = ".watch_queue.json"
+POLL_INTERVAL = 1.0
+# A file must keep the same size and mtime this long before it is converted
+SETTLE_SECONDS = 2.0
+
+
+class WatchQueue:
+    """Paths waiting for conversion, persisted so an interrupted watch resumes"""
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, QUEUE_NAME)
+        self.paths = []
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.paths = json.load(f).get("pending", [])
+            except (json.JSONDecodeError, UnicodeDecodeError, AttributeError):
+                self.paths = []
+
+    def add(self, paths):
+        new = [p for p in paths if p not in self.paths]
+        if new:
+            self.paths.extend(new)
+            self.save()
+        return new
+
+    def remove(self, paths):
+        done = set(paths)
+        self.paths = [p for p in self.paths if p not in done]
+        self.save()
+
+    def save(self):
+        write_json_atomic(self.path, {"pending": self.paths})
+
+
+class FolderWatcher:
+    """Converts images as they land in a folder, on an asyncio loop
+
+    The folder is polled with os.scandir, which is cheap for a drop folder
+    and works the same on every platform and network share. A file is
+    queued once its size and mtime have held still for the settle time, so
+    half-copied uploads are left alone. The engine should be incremental:
+    its manifest skips files already converted by an earlier run or batch.
+    """
+
+    def __init__(self, input_dir, engine, interval=POLL_INTERVAL, settle=SETTLE_SECONDS,
+                 on_result=None, on_batch=None):
+        self.input_dir = input_dir
+        self.engine = engine
+        self.interval = interval
+        self.settle = settle
+        self.on_result = on_result
+        self.on_batch = on_batch
+        os.makedirs(engine.config.output_dir, exist_ok=True)
+        self.queue = WatchQueue(engine.config.output_dir)
+        # path -> ((size, mtime_ns), time that signature was first seen)
+        self._seen = {}
+        # path -> signature last queued, so a file is queued once per change
+        self._queued = {}
+        # Queued paths that changed again while already waiting or converting
+        self._changed = set()
+        self._wake = None
+
+    def scan(self, now):
+        """Paths whose size and mtime have held still for the settle time"""
+        ready = []
+        seen = {}
+        with os.scandir(self.input_dir) as entries:
+            for entry in entries:
+                # Dotfiles are usually temporary names used while uploading
+                if entry.name.startswith(".") or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                if not stat.st_size:
+                    continue
+                signature = (stat.st_size, stat.st_mtime_ns)
+                previous = self._seen.get(entry.path)
+                since = previous[1] if previous and previous[0] == signature else now
+                seen[entry.path] = (signature, since)
+                if now - since >= self.settle and self._queued.get(entry.path) != signature:
+                    self._queued[entry.path] = signature
+                    ready.append(entry.path)
+        self._seen = seen
+        # Forget deleted files, a file copied back in is converted again
+        self._queued = {p: s for p, s in self._queued.items() if p in seen}
+        return sorted(ready)
+
+    async def _convert_loop(self, executor):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            batch = list(self.queue.paths)
+            if not batch:
+                continue
+            paths = [p for p in batch if os.path.exists(p)]
+            if self.on_batch:
+                self.on_batch(paths)
+            # engine.run blocks, so it runs off the loop and scanning goes on
+            await loop.run_in_executor(None, self.engine.run, paths, self.on_result, executor)
+            self.queue.remove(batch)
+            changed, self._changed = self._changed, set()
+            if self.queue.add(sorted(changed)):
+                self._wake.set()
+
+    async def run(self):
+        """Watch until cancelled, converting queued files in batches"""
+        loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        if self.queue.paths:
+            # Left over from an interrupted run
+            self._wake.set()
+
+        executor = self.engine.make_executor()
+        converter = asyncio.create_task(self._convert_loop(executor))
+        try:
+            while True:
+                if converter.done():
+                    # Surface a failure in the converter instead of scanning on
+                    converter.result()
+                ready = await loop.run_in_executor(None, self.scan, loop.time())
+                new = self.queue.add(ready)
+                self._changed.update(set(ready) - set(new))
+                if new:
+                    self._wake.set()
+                await asyncio.sleep(self.interval)
+        finally:
+            converter.cancel()
+            # Pending chunks are dropped, they stay in the queue for next time
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,272 @@
+
+import os
+import json
+import time
+import uuid
+import random
+import socket
+import threading
+from converter import VARIANTS_NAME, convert_to_webp, list_images, select_sources
+from fileio import write_json_atomic
+from manifest import ConversionManifest
+
+LEASE_DIR = ".leases"
+LEASE_SECONDS = 60
+POLL_SECONDS = 2.0
+# Lease name that guards folding results into the shared manifest
+MANIFEST_LEASE = ".manifest"
+
+
+def source_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class LeaseQueue:
+    """File claims shared by workers on any host through a lease directory
+
+    A claim is a lease file created with O_EXCL, which is atomic on local
+    disks and NFS alike, so SQLite locking is never relied on over the
+    network. Holders refresh the lease mtime as a heartbeat; a lease not
+    refreshed for lease_seconds belongs to a dead worker and is broken by
+    renaming it away, which only one contender can win. A finished file
+    gets a done marker with its source signature and result.
+
+    Should a slow worker lose its lease anyway, the file is converted
+    twice; outputs are renamed into place, so the copies never mix.
+    """
+
+    def __init__(self, output_dir, lease_seconds=LEASE_SECONDS, owner=None):
+        self.directory = os.path.join(output_dir, LEASE_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        # The suffix tells apart a restarted worker that got a dead one's pid
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._held = set()
+        self._lock = threading.Lock()
+
+    def _path(self, name, suffix):
+        return os.path.join(self.directory, f"{name}.{suffix}")
+
+    def _expired(self, path):
+        # Compares against this host's clock, lease_seconds must exceed the skew between hosts
+        try:
+            return time.time() - os.stat(path).st_mtime > self.lease_seconds
+        except FileNotFoundError:
+            return True
+
+    def _owner(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f).get("owner")
+        except (OSError, json.JSONDecodeError, UnicodeDecodeError, AttributeError):
+            return None
+
+    def _drop(self, path):
+        # Only remove a lease still ours; after a break it may be another worker's
+        with self._lock:
+            self._held.discard(path)
+        if self._owner(path) == self.owner:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _break(self, path):
+        # Rename is atomic, so of several workers seeing the same stale
+        # lease only one moves it; the rest find it gone
+        stale = f"{path}.{uuid.uuid4().hex}.stale"
+        try:
+            os.rename(path, stale)
+        except FileNotFoundError:
+            return
+        if not self._expired(stale):
+            # Lost a race and moved a fresh lease, put it back if still free
+            try:
+                os.link(stale, path)
+            except OSError:
+                pass
+        os.remove(stale)
+
+    def claim(self, name):
+        """Take the lease on a name, False when a live worker holds it"""
+        path = self._path(name, "lease")
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if not self._expired(path):
+                    return False
+                self._break(path)
+                continue
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"owner": self.owner, "claimed": time.time()}, f)
+            with self._lock:
+                self._held.add(path)
+            return True
+        return False
+
+    def release(self, name):
+        self._drop(self._path(name, "lease"))
+
+    def heartbeat(self):
+        """Refresh every held lease, dropping any another worker broke or took"""
+        with self._lock:
+            held = list(self._held)
+        for path in held:
+            try:
+                if self._owner(path) != self.owner:
+                    raise FileNotFoundError(path)
+                os.utime(path)
+            except FileNotFoundError:
+                with self._lock:
+                    self._held.discard(path)
+
+    def release_all(self):
+        with self._lock:
+            held = list(self._held)
+        for path in held:
+            self._drop(path)
+
+    def done(self, name, signature, settings):
+        """Done marker for a name if it matches the source and settings"""
+        try:
+            with open(self._path(name, "done"), "r", encoding="utf-8") as f:
+                marker = json.load(f)
+        except (OSError, json.JSONDecodeError, UnicodeDecodeError):
+            return None
+        if marker.get("signature") != signature or marker.get("settings") != settings:
+            return None
+        return marker
+
+    def finish(self, name, signature, settings, result):
+        """Record a result, failures included so they are not retried forever"""
+        marker = {
+            "signature": signature,
+            "settings": settings,
+            "owner": self.owner,
+            "ok": result["ok"],
+            "error": result.get("error"),
+        }
+        if result["ok"]:
+            marker.update({k: result[k] for k in ("source", "variants", "placeholder")})
+        write_json_atomic(self._path(name, "done"), marker)
+        self.release(name)
+
+    def markers(self):
+        """Every done marker by input filename"""
+        found = {}
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".done"):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), "r", encoding="utf-8") as f:
+                    found[filename[:-len(".done")]] = json.load(f)
+            except (OSError, json.JSONDecodeError, UnicodeDecodeError):
+                continue
+        return found
+
+
+class Heartbeat:
+    """Background thread refreshing a queue's leases"""
+
+    def __init__(self, queue):
+        self.queue = queue
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            self.queue.heartbeat()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def fold_results(queue, output_dir, settings):
+    """Merge the done markers into the output folder's manifest and variants.json
+
+    Runs under the manifest lease, so only one worker writes at a time. A
+    worker waits for the lease rather than skipping, or a fold already
+    reading the markers could miss the ones it just wrote.
+    """
+    while not queue.claim(MANIFEST_LEASE):
+        time.sleep(0.1)
+    try:
+        manifest = ConversionManifest(output_dir)
+        for name, marker in queue.markers().items():
+            if marker.get("ok") and marker.get("settings") == settings:
+                manifest.record(name, marker["source"], settings, marker["variants"], marker.get("placeholder"))
+        manifest.save()
+        write_json_atomic(
+            os.path.join(output_dir, VARIANTS_NAME),
+            manifest.variants_by_id(),
+            separators=(",", ":")
+        )
+    finally:
+        queue.release(MANIFEST_LEASE)
+
+
+def run_worker(input_dir, config, lease_seconds=LEASE_SECONDS, poll=POLL_SECONDS, follow=False, on_result=None):
+    """Claim and convert files until none are left, or forever with follow
+
+    Any number of these may run on any hosts that share input_dir and the
+    output folder. Returns counts of what this worker converted.
+    """
+    os.makedirs(config.output_dir, exist_ok=True)
+    queue = LeaseQueue(config.output_dir, lease_seconds)
+    settings = config.encode_settings()
+    converted = failed = 0
+    with Heartbeat(queue):
+        try:
+            while True:
+                # Files convert or watch already produced here need no claim,
+                # reloaded each pass to see what other workers folded in
+                manifest = ConversionManifest(config.output_dir)
+                # Only sources: not our own outputs, one file per output name
+                paths, _, _ = select_sources(
+                    [os.path.join(input_dir, name) for name in list_images(input_dir)], manifest
+                )
+                # Workers start at different files instead of all fighting over the first
+                random.shuffle(paths)
+                pending = worked = 0
+                for path in paths:
+                    name = os.path.basename(path)
+                    try:
+                        signature = source_signature(path)
+                    except FileNotFoundError:
+                        continue
+                    if queue.done(name, signature, settings) or manifest.is_current(path, settings):
+                        continue
+                    pending += 1
+                    if not queue.claim(name):
+                        continue
+                    # Another worker may have finished it between the check and the claim
+                    if queue.done(name, signature, settings):
+                        queue.release(name)
+                        continue
+                    result = convert_to_webp(path, config)
+                    queue.finish(name, signature, settings, result)
+                    worked += 1
+                    if result["ok"]:
+                        converted += 1
+                    else:
+                        failed += 1
+                    if on_result:
+                        on_result(result)
+
+                if worked:
+                    fold_results(queue, config.output_dir, settings)
+                if not pending and not follow:
+                    break
+                if not worked:
+                    # Remaining files are leased by others, wait for them or their expiry
+                    time.sleep(poll)
+        finally:
+            queue.release_all()
+    return {"owner": queue.owner, "converted": converted, "failed": failed}
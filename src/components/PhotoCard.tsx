@@ -1,5 +1,5 @@
 import Image from 'next/image';
-import { Photo } from '../utils/photoUtils';
+import { Photo, photoSrc } from '../utils/photoUtils';
 
 const PhotoCard = ({ photo, onClick }: { photo: Photo; onClick: () => void }) => {
   return (
@@ -10,13 +10,16 @@ const PhotoCard = ({ photo, onClick }: { photo: Photo; onClick: () => void }) =>
       )}
       <div 
         className="aspect-square overflow-hidden cursor-pointer"
+        style={photo.color ? { backgroundColor: photo.color } : undefined}
         onClick={onClick}
       >
         <Image
-          src={`/photos/${photo.id}.webp`}
+          src={photoSrc(photo)}
           alt={photo.title}
           width={600}
           height={600}
+          placeholder={photo.placeholder ? 'blur' : 'empty'}
+          blurDataURL={photo.placeholder}
           className="w-full h-full object-cover transition-transform duration-500 group-hover:scale-105"
         />
       </div>
@@ -1,6 +1,6 @@
 import { useEffect, useState } from 'react';
 import Image from 'next/image';
-import { Photo } from '../utils/photoUtils';
+import { Photo, photoSrc } from '../utils/photoUtils';
 import Skeleton from 'react-loading-skeleton';
 import 'react-loading-skeleton/dist/skeleton.css';
 
@@ -79,7 +79,7 @@ const PhotoOverlay = ({ photo, onClose }: PhotoOverlayProps) => {
             
             <div className={`relative flex items-center justify-center w-full h-full transition-opacity duration-300 ${isImageLoading ? 'opacity-0' : 'opacity-100'}`}>
               <Image
-                src={`/photos/${photo.id}.webp`}
+                src={photoSrc(photo)}
                 alt={photo.title}
                 width={0}
                 height={0}
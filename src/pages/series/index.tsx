@@ -2,7 +2,7 @@ import { useState, useEffect } from 'react';
 import Image from 'next/image';
 import Link from 'next/link';
 import PhotoOverlay from '../../components/PhotoOverlay';
-import { getSeasons, getPhotosBySeason, Photo } from '../../utils/photoUtils';
+import { getSeasons, getPhotosBySeason, Photo, photoSrc } from '../../utils/photoUtils';
 import Skeleton from 'react-loading-skeleton';
 import 'react-loading-skeleton/dist/skeleton.css';
 
@@ -116,7 +116,7 @@ export default function Series() {
                   >
                     <div className="aspect-square overflow-hidden rounded-lg">
                       <Image
-                        src={`/photos/${photo.id}.webp`}
+                        src={photoSrc(photo)}
                         alt={photo.title}
                         fill
                         className="object-cover transition-transform duration-500 group-hover:scale-110"
@@ -10,8 +10,16 @@ export type Photo = {
   udate: string;
   tdate: string;
   featured: boolean;
+  placeholder?: string;
+  color?: string;
+  // Current file name and size per format, written by the converter
+  assets?: Record<string, { file: string; bytes: number }>;
 };
 
+// Content-hashed names change with every re-encode, plain ones never do
+export const photoSrc = (photo: Photo, format: string = 'webp'): string =>
+  `/photos/${photo.assets?.[format]?.file ?? `${photo.id}.${format}`}`;
+
 export const getPhotos = async (): Promise<Photo[]> => {
   try {
     const res = await fetch('/data/photos.json');
@@ -22,7 +30,31 @@ export const getPhotos = async (): Promise<Photo[]> => {
   }
 };
 
+type PhotoIndexMeta = {
+  count: number;
+  pageSize: number;
+  pages: number;
+  seasons: string[];
+  seasonFiles: Record<string, string>;
+  tags: string[];
+};
+
+// Precomputed views written by the Python tools (site_index.py). Every
+// helper falls back to the full catalogue when the index is missing.
+const fetchIndex = async <T>(name: string): Promise<T | null> => {
+  try {
+    const res = await fetch(`/data/index/${name}`);
+    if (!res.ok) return null;
+    return await res.json();
+  } catch {
+    return null;
+  }
+};
+
 export const getFeaturedPhotos = async (count: number = 6): Promise<Photo[]> => {
+  const featured = await fetchIndex<Photo[]>('featured.json');
+  if (featured) return featured.slice(0, count);
+
   const photos = await getPhotos();
   return photos
     .filter(photo => photo.featured)
@@ -31,6 +63,9 @@ export const getFeaturedPhotos = async (count: number = 6): Promise<Photo[]> =>
 };
 
 export const getRecentPhotos = async (count: number = 5): Promise<Photo[]> => {
+  const recent = await fetchIndex<Photo[]>('recent.json');
+  if (recent && recent.length >= count) return recent.slice(0, count);
+
   const photos = await getPhotos();
   return photos
     .sort((a, b) => new Date(b.udate).getTime() - new Date(a.udate).getTime())
@@ -38,11 +73,22 @@ export const getRecentPhotos = async (count: number = 5): Promise<Photo[]> => {
 };
 
 export const getSeasons = async (): Promise<string[]> => {
+  const meta = await fetchIndex<PhotoIndexMeta>('meta.json');
+  if (meta) return meta.seasons;
+
   const photos = await getPhotos();
   return Array.from(new Set(photos.map(p => p.season)));
 };
 
 export const getPhotosBySeason = async (season: string): Promise<Photo[]> => {
+  const meta = await fetchIndex<PhotoIndexMeta>('meta.json');
+  if (meta) {
+    const file = meta.seasonFiles[season];
+    if (!file) return [];
+    const photos = await fetchIndex<Photo[]>(`seasons/${file}`);
+    if (photos) return photos;
+  }
+
   const photos = await getPhotos();
   return photos.filter(p => p.season === season);
-};
\ No newline at end of file
+};